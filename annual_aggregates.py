@@ -0,0 +1,120 @@
+import pandas as pd
+
+from tax_engine import taxParameters, totalTaxes
+
+
+# Define here the headers in CSV file
+# 9a-report.csv
+STOCK_NAMING_CONVERSION = {
+    "sell_date": "Luovutusaika",
+    "profit": "Voitto tai tappio EUR",
+    "buy_cost": "Hankintakulut EUR",
+    "sell_cost": "Myyntikulut EUR",
+    "security": "Arvopaperi",
+}
+
+# Define here the headers in CSV file
+# transactions-and-notes.csv
+DIVIDEND_NAMING_CONVERSION = {
+    "id": "Id",
+    "date": "Kauppapäivä",
+    "profit": "Summa",
+    "transaction_type": "Tapahtumatyyppi",
+    "dividend": "OSINKO",
+    "tax": "ENNAKKOPIDÄTYS",
+    "loan_interest": "LAINAKORKO",
+    "deposit": ["TALLETUS", "Reaaliaikainen talle"],
+    "security": "Arvopaperi",
+    "quantity": "Määrä",
+    "price": "Kurssi",
+    "fees": "Kokonaiskulut",
+    "buy": "OSTO",
+    "sell": "MYYNTI",
+}
+
+# Columns of the per-year frame built from the CSV files
+ANNUAL_COLUMNS = [
+    "deposit",
+    "buy_cost",
+    "sell_cost",
+    "loan_interest",
+    "loss",
+    "profit",
+    "dividend",
+    "paid_dividend_tax",
+]
+
+
+def aggregateStockData(stock_df):
+    snc = STOCK_NAMING_CONVERSION
+
+    # Stock sales per year, profits and losses split row by row
+    stock_years = stock_df[snc["sell_date"]].dt.year.rename("year")
+    stock_profit = stock_df[snc["profit"]]
+    stock_values = pd.DataFrame({
+        "buy_cost": stock_df[snc["buy_cost"]],
+        "sell_cost": stock_df[snc["sell_cost"]],
+        "loss": -stock_profit.where(stock_profit < 0, 0),
+        "profit": stock_profit.where(stock_profit >= 0, 0),
+    })
+    return stock_values.groupby(stock_years).sum()
+
+
+def aggregateTransactionTypes(dividend_df):
+    dnc = DIVIDEND_NAMING_CONVERSION
+
+    # Transactions per year and type in one pass
+    dividend_years = dividend_df[dnc["date"]].dt.year.rename("year")
+    transaction_types = dividend_df[dnc["transaction_type"]]
+    return dividend_df[dnc["profit"]].groupby(
+        [dividend_years, transaction_types], observed=True).sum().unstack(
+            fill_value=0)
+
+
+def combineAnnualData(stock_annual, transaction_annual):
+    dnc = DIVIDEND_NAMING_CONVERSION
+
+    def transactionSum(names):
+        names = [name for name in names if name in transaction_annual.columns]
+        return transaction_annual[names].sum(axis=1)
+
+    dividend_annual = pd.DataFrame({
+        "deposit": transactionSum(dnc["deposit"]),
+        "dividend": transactionSum([dnc["dividend"]]),
+        "loan_interest": transactionSum([dnc["loan_interest"]]).abs(),
+        "paid_dividend_tax": transactionSum([dnc["tax"]]).abs(),
+    })
+
+    # One row per year, also for years without any transactions
+    years = stock_annual.index.union(dividend_annual.index)
+    annual_df = pd.concat([stock_annual, dividend_annual], axis=1).reindex(
+        range(years.min(), years.max() + 1), fill_value=0).fillna(0)
+    annual_df.index.name = "year"
+    return annual_df[ANNUAL_COLUMNS]
+
+
+def aggregateAnnualData(stock_df, dividend_df):
+    return combineAnnualData(
+        aggregateStockData(stock_df), aggregateTransactionTypes(dividend_df))
+
+
+def stockIncomes(annual_df):
+    return (
+        annual_df["profit"] - annual_df["buy_cost"] - annual_df["sell_cost"] -
+        annual_df["loan_interest"] - annual_df["loss"])
+
+
+def taxedIncomes(annual_df):
+    return stockIncomes(annual_df) + 0.85 * annual_df["dividend"]
+
+
+def computeAnnualTaxes(annual_df):
+    annual_df = annual_df.copy()
+    taxed_incomes = taxedIncomes(annual_df)
+    annual_df["income"] = stockIncomes(annual_df) + annual_df["dividend"]
+    annual_df["total_tax"] = totalTaxes(
+        taxed_incomes.to_numpy(), **taxParameters(annual_df.index))
+    annual_df["residual_tax"] = (
+        annual_df["total_tax"] - annual_df["paid_dividend_tax"]).clip(lower=0)
+    annual_df["net_income"] = annual_df["income"] - annual_df["total_tax"]
+    return annual_df
@@ -0,0 +1,343 @@
+import argparse
+import asyncio
+import json
+import math
+import sys
+from collections import OrderedDict
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from calculations import equityProjection, growthForecast
+from growth_fit import YEARS_PREDICTION, toJson
+from period_aggregates import dayNumbers
+from projection import TARGET_EQUITY, annualValues
+from watch import POLL_INTERVAL, copyWatchState, newWatchState, refresh
+
+
+HOST = "127.0.0.1"
+PORT = 8765
+CACHE_SIZE = 256
+MAX_PROJECTION_YEARS = 100
+MAX_REQUEST_LINE = 8192
+
+# Outputs of the watch state a response is computed from, a new version of
+# any of them makes cached responses stale
+ENDPOINT_OUTPUTS = {
+    "/tax": ["tax"],
+    "/growth": ["growth"],
+    "/forecast": ["forecast"],
+    "/snapshots": ["growth"],
+    "/equity": ["equity"],
+    "/projection": [],
+}
+HTTP_STATUSES = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    503: "Service Unavailable",
+}
+
+
+class RequestError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def finiteJson(value):
+    # JSON has no NaN or infinity, they are sent as null
+    value = toJson(value)
+    if isinstance(value, dict):
+        return {key: finiteJson(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [finiteJson(item) for item in value]
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def queryValue(query, name, convert, default=None):
+    if name not in query:
+        if default is None:
+            raise RequestError(400, f"Missing parameter ({name})")
+        return default
+    try:
+        return convert(query[name])
+    except ValueError:
+        raise RequestError(400, f"Invalid parameter ({name}={query[name]})")
+
+
+def requireOutput(state, output):
+    if output not in state["outputs"]:
+        raise RequestError(503, f"No {output} data, check the input files")
+    return state["outputs"][output]
+
+
+def numbersToDates(dates_as_numbers):
+    return (np.datetime64("1970-01-01") + np.asarray(
+        dates_as_numbers).astype("timedelta64[D]")).astype(str)
+
+
+def dateNumber(text):
+    return dayNumbers(np.datetime64(text, "D"))
+
+
+def taxResponse(state, query):
+    tax_df = requireOutput(state, "tax")
+    if "year" in query:
+        year = queryValue(query, "year", int)
+        if year not in tax_df.index:
+            raise RequestError(404, f"No taxes for year {year}")
+        tax_df = tax_df.loc[[year]]
+    return [
+        {"year": int(year), **row}
+        for year, row in zip(tax_df.index, tax_df.to_dict("records"))]
+
+
+def growthResponse(state, query):
+    return requireOutput(state, "growth")
+
+
+def forecastResponse(state, query):
+    years = queryValue(query, "years", float, YEARS_PREDICTION)
+    if years == YEARS_PREDICTION:
+        return requireOutput(state, "forecast")
+    requireOutput(state, "forecast")
+    date_values = state["data"]["date_values"]
+    return growthForecast(
+        date_values["dates_as_numbers"],
+        [date_values["savings"], date_values["equities"]],
+        ["savings", "equities"], years)
+
+
+def snapshotsResponse(state, query):
+    requireOutput(state, "growth")
+    date_values = state["data"]["date_values"]
+    dates_as_numbers = date_values["dates_as_numbers"]
+    start = np.searchsorted(dates_as_numbers, queryValue(
+        query, "start", dateNumber, -np.inf), side="left")
+    end = np.searchsorted(dates_as_numbers, queryValue(
+        query, "end", dateNumber, np.inf), side="right")
+    return {
+        "dates": numbersToDates(dates_as_numbers[start:end]),
+        **{key: date_values[key][start:end]
+           for key in ["savings", "stock_profits", "equities"]},
+    }
+
+
+def equityResponse(state, query):
+    return requireOutput(state, "equity")
+
+
+def projectionResponse(state, query):
+    years = queryValue(query, "years", int, 20)
+    if not 0 < years <= MAX_PROJECTION_YEARS:
+        raise RequestError(400, f"Invalid parameter (years={years})")
+    annual_return_percent = queryValue(
+        query, "annual_return_percent", float, 7.0)
+    if not annual_return_percent >= -100:
+        raise RequestError(
+            400, "Invalid parameter "
+            f"(annual_return_percent={annual_return_percent})")
+    projection = equityProjection(
+        queryValue(query, "start_equity", float),
+        queryValue(query, "monthly_savings", float),
+        queryValue(query, "savings_increase_percent", float, 0.0),
+        annual_return_percent, years,
+        queryValue(query, "target", float, float(TARGET_EQUITY)))
+    months_to_target = int(projection["months_to_target"])
+    return {
+        "months_to_target": None if months_to_target < 0
+        else months_to_target,
+        "annual_equities": annualValues(projection["equities"]),
+        "annual_savings": annualValues(projection["savings"]),
+    }
+
+
+ENDPOINTS = {
+    "/tax": taxResponse,
+    "/growth": growthResponse,
+    "/forecast": forecastResponse,
+    "/snapshots": snapshotsResponse,
+    "/equity": equityResponse,
+    "/projection": projectionResponse,
+}
+
+
+def newResponseCache(size=CACHE_SIZE):
+    return {"size": size, "entries": OrderedDict(), "hits": 0, "misses": 0}
+
+
+def cachedResponse(cache, state, path, query):
+    # Least recently used responses are dropped first, keys include the
+    # versions of the outputs so changed inputs are never served stale
+    key = (path, tuple(sorted(query.items())), tuple(
+        state["versions"][output] for output in ENDPOINT_OUTPUTS[path]))
+    entries = cache["entries"]
+    if key in entries:
+        entries.move_to_end(key)
+        cache["hits"] += 1
+        return entries[key]
+    cache["misses"] += 1
+    body = json.dumps(finiteJson(ENDPOINTS[path](state, query))).encode()
+    entries[key] = body
+    if len(entries) > cache["size"]:
+        entries.popitem(last=False)
+    return body
+
+
+def handleRequest(state, cache, method, target):
+    # (status, body) of a request
+    url = urlsplit(target)
+    if url.path == "/":
+        return 200, json.dumps({
+            "endpoints": list(ENDPOINTS),
+            "versions": state["versions"],
+            "cache": {key: cache[key] for key in ["hits", "misses"]},
+        }).encode()
+    if url.path not in ENDPOINTS:
+        return 404, json.dumps({"error": "Unknown endpoint"}).encode()
+    if method not in ("GET", "HEAD"):
+        return 405, json.dumps({"error": "Only GET is allowed"}).encode()
+    try:
+        return 200, cachedResponse(
+            cache, state, url.path, dict(parse_qsl(url.query)))
+    except RequestError as error:
+        return error.status, json.dumps({"error": str(error)}).encode()
+
+
+async def readRequest(reader):
+    # Request line and headers, None when the client closed the connection
+    request_line = await reader.readline()
+    if not request_line:
+        return None
+    if len(request_line) > MAX_REQUEST_LINE:
+        raise ValueError("Request line too long")
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b"\r\n", b"\n", b""):
+            break
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+    method, target, version = request_line.decode("latin-1").split()
+    if int(headers.get("content-length", 0)):
+        await reader.readexactly(int(headers["content-length"]))
+    keep_alive = (
+        headers.get("connection", "").lower() != "close" if
+        version == "HTTP/1.1" else
+        headers.get("connection", "").lower() == "keep-alive")
+    return method, target, keep_alive
+
+
+async def serveConnection(current, cache, reader, writer):
+    # current["state"] is replaced after every refresh, a request uses the
+    # state current when it arrived
+    try:
+        while True:
+            try:
+                request = await readRequest(reader)
+            except (ValueError, asyncio.IncompleteReadError):
+                request = None
+            if request is None:
+                break
+            method, target, keep_alive = request
+            status, body = handleRequest(
+                current["state"], cache, method, target)
+            writer.write(
+                "HTTP/1.1 {} {}\r\n"
+                "Content-Type: application/json\r\n"
+                "Content-Length: {}\r\n"
+                "Connection: {}\r\n\r\n".format(
+                    status, HTTP_STATUSES[status], len(body),
+                    "keep-alive" if keep_alive else "close").encode())
+            if method != "HEAD":
+                writer.write(body)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except ConnectionError:
+        pass
+    finally:
+        writer.close()
+
+
+async def refreshState(current):
+    # Inputs are read in a thread on a copy of the state, requests are
+    # served from the old state meanwhile. A failed refresh leaves it as it
+    # was.
+    state = copyWatchState(current["state"])
+    await asyncio.to_thread(refresh, state, False)
+    current["state"] = state
+
+
+async def refreshPeriodically(current, interval):
+    # The watch state reads only the changed inputs, new output versions
+    # leave the cached responses of them unused
+    while True:
+        try:
+            await refreshState(current)
+        except Exception as error:
+            print(f"Update failed, retrying: {error}", file=sys.stderr)
+        await asyncio.sleep(interval)
+
+
+async def serve(state, host=HOST, port=PORT, interval=POLL_INTERVAL,
+                cache_size=CACHE_SIZE):
+    cache = newResponseCache(cache_size)
+    current = {"state": state}
+    await refreshState(current)
+    server = await asyncio.start_server(
+        lambda reader, writer: serveConnection(
+            current, cache, reader, writer),
+        host, port)
+    print(f"Serving on http://{host}:{port}", flush=True)
+    async with server:
+        await asyncio.gather(
+            server.serve_forever(), refreshPeriodically(current, interval))
+
+
+def readCommandLineArguments(argv=None):
+    from capital_income_tax_calculator import (
+        DIVIDEND_CSV_FILE,
+        STOCK_CSV_FILE,
+    )
+    from equity import FINANCE_INFO_FILE
+    from plot_wealth_chart import CSV_FILE_NAME, DELIMITER
+    parser = argparse.ArgumentParser(
+        description="Serve the calculated figures as JSON over HTTP")
+    parser.add_argument("--host", default=HOST)
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--stock-csv", default=STOCK_CSV_FILE)
+    parser.add_argument("--dividend-csv", default=DIVIDEND_CSV_FILE)
+    parser.add_argument(
+        "--wealth", default=CSV_FILE_NAME,
+        help="omaisuus.csv style file or a snapshot store")
+    parser.add_argument("--delimiter", default=DELIMITER)
+    parser.add_argument("--finance-info", default=FINANCE_INFO_FILE)
+    parser.add_argument(
+        "--interval", type=float, default=POLL_INTERVAL,
+        help="Seconds between checks of the input files")
+    parser.add_argument("--cache-size", type=int, default=CACHE_SIZE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    state = newWatchState({
+        "stock_csv": args.stock_csv,
+        "dividend_csv": args.dividend_csv,
+        "wealth": args.wealth,
+        "finance_info": args.finance_info,
+    }, delimiter=args.delimiter)
+    try:
+        asyncio.run(serve(
+            state, args.host, args.port, args.interval, args.cache_size))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,14 @@
+import os
+
+
+def writeAtomically(path, write_function):
+    # write_function writes a temporary file that then replaces path, readers
+    # never see a partly written file
+    temporary_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        write_function(temporary_path)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
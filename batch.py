@@ -0,0 +1,148 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+import yaml
+
+from capital_income_tax_calculator import (
+    DIVIDEND_CSV_FILE,
+    STOCK_CSV_FILE,
+    aggregateAnnualData,
+    computeAnnualTaxes,
+    printAnnualTable,
+    readDividendCsv,
+    readStockCsv,
+)
+from export_cache import CACHE_DIRECTORY, readCachedCsv
+from period_aggregates import CSV_FILE_NAME
+
+
+MANIFEST_FILE = "accounts.yaml"
+
+
+def readManifest(file_name):
+    # Account directories are relative to the manifest. Accounts without a
+    # taxpayer are taxed alone.
+    with open(file_name) as file:
+        manifest = yaml.safe_load(file)
+    manifest_directory = os.path.dirname(os.path.abspath(file_name))
+    accounts = []
+    for account in manifest["accounts"]:
+        directory = os.path.join(manifest_directory, account["directory"])
+        name = account.get("name", os.path.basename(os.path.normpath(
+            directory)))
+        accounts.append({
+            "name": name,
+            "taxpayer": account.get("taxpayer", name),
+            "stock_csv": os.path.join(
+                directory, account.get("stock_csv", STOCK_CSV_FILE)),
+            "dividend_csv": os.path.join(
+                directory, account.get("dividend_csv", DIVIDEND_CSV_FILE)),
+            "wealth_csv": os.path.join(
+                directory, account.get("wealth_csv", CSV_FILE_NAME)),
+        })
+    names = [account["name"] for account in accounts]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Account names are not unique ({file_name})")
+    return accounts
+
+
+def readAccountAnnualData(account, cache_directory=CACHE_DIRECTORY):
+    # Parsed exports are shared through the cache, accounts with identical
+    # exports and later runs skip the parsing
+    return aggregateAnnualData(
+        readCachedCsv(account["stock_csv"], readStockCsv, cache_directory),
+        readCachedCsv(
+            account["dividend_csv"], readDividendCsv, cache_directory))
+
+
+def readAnnualDatas(accounts, cache_directory=CACHE_DIRECTORY, workers=None):
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        annual_dfs = executor.map(
+            readAccountAnnualData, accounts,
+            [cache_directory] * len(accounts))
+        return {
+            account["name"]: annual_df
+            for account, annual_df in zip(accounts, annual_dfs)}
+
+
+def sumAnnualData(annual_dfs):
+    annual_df = pd.concat(annual_dfs).groupby(level=0).sum()
+    return annual_df.reindex(
+        range(annual_df.index.min(), annual_df.index.max() + 1), fill_value=0)
+
+
+def taxpayerAnnualData(accounts, annual_dfs):
+    # Incomes and losses of one taxpayer's accounts are summed before the
+    # losses are carried forward
+    taxpayers = {}
+    for account in accounts:
+        taxpayers.setdefault(account["taxpayer"], []).append(
+            annual_dfs[account["name"]])
+    return {
+        taxpayer: computeAnnualTaxes(sumAnnualData(taxpayer_dfs))
+        for taxpayer, taxpayer_dfs in taxpayers.items()}
+
+
+def householdAnnualData(taxpayer_dfs):
+    # Taxes are not recomputed, the household pays the sum of its taxpayers
+    return sumAnnualData(list(taxpayer_dfs.values()))
+
+
+def wealthReportTasks(accounts):
+    from report import TAX_FIGURE
+    from plot_wealth_chart import WEALTH_FIGURES
+    tasks = []
+    for account in accounts:
+        if os.path.exists(account["wealth_csv"]):
+            for figure_name in WEALTH_FIGURES:
+                tasks.append(
+                    (account["name"], figure_name, account["wealth_csv"]))
+        tasks.append((
+            account["name"], TAX_FIGURE,
+            (account["stock_csv"], account["dividend_csv"])))
+    return tasks
+
+
+def printTitle(title):
+    print()
+    print(title)
+    print("=" * len(title))
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Calculate capital income tax of several accounts")
+    parser.add_argument("manifest", nargs="?", default=MANIFEST_FILE)
+    parser.add_argument("--cache-directory", default=CACHE_DIRECTORY)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument(
+        "--report-directory",
+        help="Also render the charts of every account to this directory")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    accounts = readManifest(args.manifest)
+    annual_dfs = readAnnualDatas(accounts, args.cache_directory, args.workers)
+    for account in accounts:
+        printTitle(f"Account {account['name']} ({account['taxpayer']})")
+        printAnnualTable(computeAnnualTaxes(annual_dfs[account["name"]]))
+    taxpayer_dfs = taxpayerAnnualData(accounts, annual_dfs)
+    for taxpayer, taxpayer_df in taxpayer_dfs.items():
+        printTitle(f"Taxpayer {taxpayer}")
+        printAnnualTable(taxpayer_df)
+    printTitle("Household")
+    printAnnualTable(householdAnnualData(taxpayer_dfs))
+    if args.report_directory:
+        from report import renderReport
+        for file_name in renderReport(
+                wealthReportTasks(accounts), args.report_directory,
+                workers=args.workers):
+            print(file_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,309 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import statistics
+import sys
+import time
+import tracemalloc
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__)))
+sys.path.insert(0, REPOSITORY_DIRECTORY)
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+import numpy as np
+
+import capital_income_tax_calculator
+from capital_income_tax_calculator import (
+    aggregateAnnualData,
+    computeAnnualTaxes,
+    plotAnnualData,
+    printAnnualTable,
+    readDividendCsv,
+    readStockCsv,
+)
+from plot_wealth_chart import readCsvData
+from profiling import PROFILE, configureProfiling
+from projection import firstCrossingMonths, isMonotonic, projectEquity
+from synthetic_data import START_YEAR, YEARS, datasetFiles, writeDataset
+
+
+BENCHMARKS_DIRECTORY = os.path.join(REPOSITORY_DIRECTORY, "benchmarks")
+DATA_DIRECTORY = os.path.join(BENCHMARKS_DIRECTORY, "data")
+RESULTS_DIRECTORY = os.path.join(BENCHMARKS_DIRECTORY, "results")
+RESULTS_FILE = os.path.join(RESULTS_DIRECTORY, "pipeline.json")
+BASELINE_FILE = os.path.join(RESULTS_DIRECTORY, "pipeline_baseline.json")
+REPEATS = 3
+BENCHMARKS = ["tax", "main", "read_csv_data", "projection"]
+
+# Slower than the baseline by more than this share is a regression
+REGRESSION_THRESHOLD = 0.10
+
+# Stages faster than this in the baseline are too noisy to fail a run
+MIN_COMPARED_SECONDS = 0.05
+
+# Stages of readStockCsv() and readDividendCsv() summed into the stages
+# of the benchmark
+READ_STAGES = {
+    "decode": ["stock_decode", "dividend_decode"],
+    "date_parse": ["stock_date_parse", "dividend_date_parse"],
+    "amounts": ["stock_amounts", "dividend_amounts"],
+}
+
+
+def taxStages(files):
+    # Steps of main() of the tax calculator timed one by one, the decode,
+    # date parse and amounts stages come from the stage() records of the
+    # CSV readers
+    def read(_):
+        configureProfiling("table")
+        try:
+            return readStockCsv(files["stock_csv"]), readDividendCsv(
+                files["dividend_csv"])
+        finally:
+            PROFILE["enabled"] = False
+
+    def aggregate(dfs):
+        return aggregateAnnualData(*dfs)
+
+    def render(annual_df):
+        fig = plt.figure()
+        try:
+            plotAnnualData(annual_df, show=False)
+            fig.savefig(io.BytesIO(), format="png")
+        finally:
+            plt.close(fig)
+        with contextlib.redirect_stdout(io.StringIO()):
+            printAnnualTable(annual_df)
+
+    return [
+        ("read", read),
+        ("aggregation", aggregate),
+        ("tax", computeAnnualTaxes),
+        ("rendering", render),
+    ]
+
+
+def mainStages(files):
+    def runMain(_):
+        with contextlib.redirect_stdout(io.StringIO()):
+            capital_income_tax_calculator.main([
+                "--no-cache", "--stock-csv", files["stock_csv"],
+                "--dividend-csv", files["dividend_csv"]])
+        plt.close("all")
+
+    return [("main", runMain)]
+
+
+def readCsvDataStages(files):
+    return [("read_csv_data", lambda _: readCsvData(files["wealth_csv"], ","))]
+
+
+def projectionStages(scenarios):
+    # Grid of scenarios like parameter_sweep.py, progress_estimation.py is a
+    # single one of them
+    rng = np.random.default_rng(0)
+    monthly_savings = rng.uniform(100, 5000, scenarios)
+    savings_increase_percent = rng.uniform(0, 10, scenarios)
+    annual_return_percent = rng.uniform(0, 15, scenarios)
+
+    def project(_):
+        return projectEquity(
+            0, monthly_savings, savings_increase_percent,
+            annual_return_percent, 20)
+
+    def firstCrossing(projection):
+        return firstCrossingMonths(
+            projection["equities"], 1_000_000,
+            isMonotonic(projection, annual_return_percent))
+
+    return [("project", project), ("first_crossing", firstCrossing)]
+
+
+def recordedStages(records):
+    # Seconds of the profiled stages a stage ran, summed per READ_STAGES
+    return {
+        name: sum(
+            record["seconds"] for record in records
+            if record["stage"] in recorded_names)
+        for name, recorded_names in READ_STAGES.items()
+        if any(record["stage"] in recorded_names for record in records)}
+
+
+def runStages(stages, trace_memory=False):
+    # Seconds of every stage and of the profiled stages inside it, or peak
+    # bytes allocated by every stage
+    results = {}
+    value = None
+    for name, function in stages:
+        PROFILE["stages"] = []
+        if trace_memory:
+            tracemalloc.start()
+            value = function(value)
+            _, results[name] = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+        else:
+            start = time.perf_counter()
+            value = function(value)
+            results[name] = time.perf_counter() - start
+            results.update(recordedStages(PROFILE["stages"]))
+    return results
+
+
+def measure(stages, repeats=REPEATS):
+    # Timed runs are separate from the traced one, tracing slows them down.
+    # Profiled stages have no peak of their own.
+    times = [runStages(stages) for _ in range(repeats)]
+    peaks = runStages(stages, trace_memory=True)
+    return {
+        name: {
+            "seconds": statistics.median(run[name] for run in times),
+            "peak_bytes": peaks.get(name),
+        }
+        for name in times[0]}
+
+
+def datasetDirectory(args):
+    return os.path.join(DATA_DIRECTORY, "{}-{}-{}-{}-{}".format(
+        args.stock_rows, args.transaction_rows, args.snapshots,
+        args.start_year, args.years))
+
+
+def readDataset(args):
+    # Generated files are kept, large ones take a while to write
+    directory = datasetDirectory(args)
+    if os.path.exists(os.path.join(directory, "complete")):
+        return datasetFiles(directory)
+    files = writeDataset(
+        directory, args.stock_rows, args.transaction_rows, args.snapshots,
+        args.start_year, args.years)
+    open(os.path.join(directory, "complete"), "w").close()
+    return files
+
+
+def compareResults(results, baseline, threshold=REGRESSION_THRESHOLD):
+    # (benchmark, stage, seconds, baseline seconds, ratio, is regression) of
+    # every stage found in both, regressions are 1 + threshold times slower
+    comparisons = []
+    for benchmark, stages in results["benchmarks"].items():
+        for stage, result in stages.items():
+            baseline_result = baseline["benchmarks"].get(benchmark, {}).get(
+                stage)
+            if baseline_result is None:
+                continue
+            ratio = result["seconds"] / max(baseline_result["seconds"], 1e-9)
+            comparisons.append((
+                benchmark, stage, result["seconds"],
+                baseline_result["seconds"], ratio,
+                ratio > 1 + threshold and
+                baseline_result["seconds"] >= MIN_COMPARED_SECONDS))
+    return comparisons
+
+
+def printResults(results, comparisons):
+    baseline_seconds = {
+        (benchmark, stage): (seconds, is_regression)
+        for benchmark, stage, _, seconds, _, is_regression in comparisons}
+    print("{:<14} {:<15} {:>10} {:>12} {:>14}".format(
+        "Benchmark", "Stage", "Seconds", "Peak MiB", "Baseline"))
+    for benchmark, stages in results["benchmarks"].items():
+        for stage, result in stages.items():
+            baseline = ""
+            if (benchmark, stage) in baseline_seconds:
+                seconds, is_regression = baseline_seconds[benchmark, stage]
+                baseline = "{:.4f}{}".format(
+                    seconds, " SLOWER" if is_regression else "")
+            print("{:<14} {:<15} {:>10.4f} {:>12} {:>14}".format(
+                benchmark, stage, result["seconds"],
+                "" if result["peak_bytes"] is None else
+                "{:.1f}".format(result["peak_bytes"] / 2 ** 20), baseline))
+    print("Max RSS: {:.1f} MiB".format(results["max_rss_bytes"] / 2 ** 20))
+
+
+def writeJson(file_name, value):
+    os.makedirs(os.path.dirname(os.path.abspath(file_name)), exist_ok=True)
+    with open(file_name, "w") as file:
+        json.dump(value, file, indent=2)
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Time the stages of the calculations on synthetic data")
+    parser.add_argument(
+        "benchmarks", nargs="*", metavar="benchmark",
+        help="Benchmarks to run ({}), all by default".format(
+            ", ".join(BENCHMARKS)))
+    parser.add_argument("--stock-rows", type=int, default=100_000)
+    parser.add_argument("--transaction-rows", type=int, default=100_000)
+    parser.add_argument("--snapshots", type=int, default=1000)
+    parser.add_argument("--start-year", type=int, default=START_YEAR)
+    parser.add_argument("--years", type=int, default=YEARS)
+    parser.add_argument("--scenarios", type=int, default=10_000)
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    parser.add_argument("--baseline", default=BASELINE_FILE)
+    parser.add_argument(
+        "--save-baseline", action="store_true",
+        help="Store the results as the baseline of later runs")
+    parser.add_argument(
+        "--threshold", type=float, default=REGRESSION_THRESHOLD,
+        help="Share slower than the baseline that fails the run")
+    args = parser.parse_args(argv)
+    for benchmark in args.benchmarks:
+        if benchmark not in BENCHMARKS:
+            parser.error(f"unknown benchmark ({benchmark})")
+    args.benchmarks = args.benchmarks or BENCHMARKS
+    return args
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    files = readDataset(args)
+    stage_functions = {
+        "tax": lambda: taxStages(files),
+        "main": lambda: mainStages(files),
+        "read_csv_data": lambda: readCsvDataStages(files),
+        "projection": lambda: projectionStages(args.scenarios),
+    }
+    results = {
+        "config": {
+            "stock_rows": args.stock_rows,
+            "transaction_rows": args.transaction_rows,
+            "snapshots": args.snapshots,
+            "start_year": args.start_year,
+            "years": args.years,
+            "scenarios": args.scenarios,
+        },
+        "repeats": args.repeats,
+        "benchmarks": {
+            benchmark: measure(stage_functions[benchmark](), args.repeats)
+            for benchmark in args.benchmarks},
+        # Kilobytes on Linux
+        "max_rss_bytes": resource.getrusage(
+            resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
+    writeJson(args.output, results)
+
+    comparisons = []
+    if os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+        if baseline["config"] != results["config"]:
+            print("Baseline was run with other settings, not compared",
+                  file=sys.stderr)
+        else:
+            comparisons = compareResults(results, baseline, args.threshold)
+    printResults(results, comparisons)
+    if args.save_baseline:
+        writeJson(args.baseline, results)
+    if any(is_regression for *_, is_regression in comparisons):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
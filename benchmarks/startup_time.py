@@ -0,0 +1,94 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__)))
+sys.path.insert(0, REPOSITORY_DIRECTORY)
+
+from financial_progress import SUBCOMMANDS
+
+
+RESULTS_DIRECTORY = os.path.join(REPOSITORY_DIRECTORY, "benchmarks", "results")
+RESULTS_FILE = os.path.join(RESULTS_DIRECTORY, "startup_time.json")
+REPEATS = 5
+
+
+def importTimes(command):
+    # Self and cumulative microseconds of every module from -X importtime
+    code = (
+        "import financial_progress; "
+        f"financial_progress.importSubcommand({command!r})")
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPOSITORY_DIRECTORY, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative_time, name = line[len("import time:"):].split(
+            "|")
+        modules[name.strip()] = (int(self_time), int(cumulative_time))
+    return modules
+
+
+def wallTime(command):
+    # Interpreter start and subcommand imports without running it
+    code = (
+        "import financial_progress; "
+        f"financial_progress.importSubcommand({command!r})")
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", code], cwd=REPOSITORY_DIRECTORY, check=True)
+    return time.perf_counter() - start
+
+
+def measure(command, repeats=REPEATS):
+    modules = importTimes(command)
+    slowest = sorted(
+        modules.items(), key=lambda item: item[1][1], reverse=True)[:5]
+    return {
+        "import_us": sum(self_time for self_time, _ in modules.values()),
+        "modules": len(modules),
+        "slowest_imports_us": {
+            name: cumulative_time for name, (_, cumulative_time) in slowest},
+        "wall_time_s": statistics.median(
+            wallTime(command) for _ in range(repeats)),
+    }
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Measure the import cost of every CLI subcommand")
+    parser.add_argument(
+        "commands", nargs="*", metavar="command",
+        help="Subcommands to measure, all by default")
+    parser.add_argument("--repeats", type=int, default=REPEATS)
+    parser.add_argument("--output", default=RESULTS_FILE)
+    args = parser.parse_args(argv)
+    for command in args.commands:
+        if command not in SUBCOMMANDS:
+            parser.error(f"unknown subcommand ({command})")
+    args.commands = args.commands or list(SUBCOMMANDS)
+    return args
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    results = {}
+    for command in args.commands:
+        results[command] = measure(command, args.repeats)
+        print("{:<10} {:>10,} us imports {:>8.3f} s wall time".format(
+            command, results[command]["import_us"],
+            results[command]["wall_time_s"]))
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as file:
+        json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+import argparse
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__)))
+sys.path.insert(0, REPOSITORY_DIRECTORY)
+
+from capital_income_tax_calculator import (
+    DIVIDEND_CSV_FILE,
+    DIVIDEND_NAMING_CONVERSION,
+    STOCK_CSV_FILE,
+    STOCK_NAMING_CONVERSION,
+)
+from plot_wealth_chart import CSV_FILE_NAME
+
+
+START_YEAR = 2015
+YEARS = 10
+N_SECURITIES = 200
+CHUNK_ROWS = 1_000_000
+
+# Transaction type of transactions-and-notes.csv, share of rows and range of
+# the amount, negative amounts are paid by the account
+dnc = DIVIDEND_NAMING_CONVERSION
+TRANSACTION_TYPES = [
+    (dnc["deposit"][0], 0.10, (100, 3000)),
+    (dnc["deposit"][1], 0.05, (100, 3000)),
+    (dnc["dividend"], 0.25, (1, 200)),
+    (dnc["tax"], 0.10, (-50, -1)),
+    (dnc["loan_interest"], 0.05, (-30, -1)),
+    (dnc["buy"], 0.25, (-9000, -100)),
+    (dnc["sell"], 0.20, (100, 9000)),
+]
+
+
+def formatAmounts(amounts, thousands_separator=False):
+    # Finnish format, e.g. "-1 234,56" when thousands are separated
+    cents = np.round(np.abs(amounts) * 100).astype(np.int64)
+    units = pd.Series(cents // 100)
+    if thousands_separator:
+        texts = (units % 1000).astype(str)
+        units //= 1000
+        while units.any():
+            is_grouped = units > 0
+            texts = texts.where(
+                ~is_grouped,
+                (units % 1000).astype(str) + " " + texts.str.zfill(3))
+            units //= 1000
+        units = texts
+    else:
+        units = units.astype(str)
+    fractions = pd.Series(cents % 100).astype(str).str.zfill(2)
+    signs = pd.Series(np.where(amounts < 0, "-", ""))
+    return signs + units + "," + fractions
+
+
+def randomDates(rng, n_rows, start_year, years, date_format):
+    # Every day of the span is formatted once and then picked per row
+    days = pd.date_range(
+        f"{start_year}-01-01", f"{start_year + years - 1}-12-31")
+    return pd.Categorical.from_codes(
+        rng.integers(0, len(days), n_rows), days.strftime(date_format))
+
+
+def securityNames(rng, n_rows):
+    return pd.Categorical.from_codes(
+        rng.integers(0, N_SECURITIES, n_rows),
+        [f"SEC{index}" for index in range(N_SECURITIES)])
+
+
+def writeChunks(file_name, n_rows, chunk_function, seed):
+    # UTF-16 encodes the byte order mark once, at the start of the file
+    rng = np.random.default_rng(seed)
+    with open(file_name, "w", encoding="utf-16", newline="") as file:
+        for start in range(0, max(n_rows, 1), CHUNK_ROWS):
+            chunk = chunk_function(
+                rng, start, min(CHUNK_ROWS, n_rows - start))
+            chunk.to_csv(
+                file, sep="\t", index=False, header=start == 0,
+                lineterminator="\n")
+
+
+def stockChunk(rng, start, n_rows, start_year=START_YEAR, years=YEARS):
+    snc = STOCK_NAMING_CONVERSION
+    profits = rng.normal(50, 400, n_rows)
+    return pd.DataFrame({
+        snc["sell_date"]: randomDates(
+            rng, n_rows, start_year, years, "%d.%m.%Y"),
+        "Arvopaperi": securityNames(rng, n_rows),
+        snc["profit"]: formatAmounts(profits),
+        snc["buy_cost"]: formatAmounts(rng.uniform(0, 15, n_rows)),
+        snc["sell_cost"]: formatAmounts(rng.uniform(0, 15, n_rows)),
+    })
+
+
+def transactionChunk(rng, start, n_rows, start_year=START_YEAR, years=YEARS):
+    names = np.array([name for name, _, _ in TRANSACTION_TYPES])
+    shares = np.array([share for _, share, _ in TRANSACTION_TYPES])
+    ranges = np.array([
+        amount_range for _, _, amount_range in TRANSACTION_TYPES])
+    types = rng.choice(len(names), n_rows, p=shares / shares.sum())
+    amounts = rng.uniform(ranges[types, 0], ranges[types, 1])
+    quantities = rng.integers(1, 100, n_rows)
+    return pd.DataFrame({
+        dnc["id"]: np.arange(start, start + n_rows),
+        dnc["date"]: randomDates(rng, n_rows, start_year, years, "%Y-%m-%d"),
+        dnc["transaction_type"]: names[types],
+        dnc["security"]: securityNames(rng, n_rows),
+        dnc["quantity"]: quantities,
+        dnc["price"]: formatAmounts(np.abs(amounts) / quantities),
+        dnc["fees"]: formatAmounts(rng.uniform(0, 9, n_rows)),
+        dnc["profit"]: formatAmounts(amounts, thousands_separator=True),
+    })
+
+
+def writeStockCsv(file_name, n_rows, start_year=START_YEAR, years=YEARS,
+                  seed=0):
+    writeChunks(
+        file_name, n_rows,
+        lambda rng, start, n: stockChunk(rng, start, n, start_year, years),
+        seed)
+
+
+def writeTransactionCsv(file_name, n_rows, start_year=START_YEAR,
+                        years=YEARS, seed=1):
+    writeChunks(
+        file_name, n_rows,
+        lambda rng, start, n: transactionChunk(
+            rng, start, n, start_year, years),
+        seed)
+
+
+def writeWealthCsv(file_name, n_snapshots, start_year=START_YEAR,
+                   years=YEARS, seed=2):
+    # Snapshots on distinct days, savings only grow and stock profits are a
+    # random walk
+    rng = np.random.default_rng(seed)
+    start = np.datetime64(f"{start_year}-01-01")
+    n_days = (np.datetime64(f"{start_year + years}-01-01") - start).astype(int)
+    n_snapshots = min(n_snapshots, n_days)
+    dates = pd.Series(start + np.sort(rng.choice(
+        n_days, n_snapshots, replace=False)))
+    savings = 5000 + np.cumsum(rng.integers(0, 1000, n_snapshots))
+    stock_profits = np.cumsum(rng.normal(20, 500, n_snapshots)).astype(
+        np.int64)
+    pd.DataFrame({
+        "day": dates.dt.day,
+        "month": dates.dt.month,
+        "year": dates.dt.year,
+        "savings": savings,
+        "stock_profits": stock_profits,
+    }).to_csv(file_name, index=False, lineterminator="\n")
+
+
+def datasetFiles(directory):
+    return {
+        "stock_csv": os.path.join(directory, STOCK_CSV_FILE),
+        "dividend_csv": os.path.join(directory, DIVIDEND_CSV_FILE),
+        "wealth_csv": os.path.join(directory, CSV_FILE_NAME),
+    }
+
+
+def writeDataset(directory, stock_rows, transaction_rows, snapshots,
+                 start_year=START_YEAR, years=YEARS):
+    os.makedirs(directory, exist_ok=True)
+    files = datasetFiles(directory)
+    writeStockCsv(files["stock_csv"], stock_rows, start_year, years)
+    writeTransactionCsv(
+        files["dividend_csv"], transaction_rows, start_year, years)
+    writeWealthCsv(files["wealth_csv"], snapshots, start_year, years)
+    return files
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Write synthetic Nordnet exports and a wealth history")
+    parser.add_argument("directory")
+    parser.add_argument("--stock-rows", type=int, default=10_000)
+    parser.add_argument("--transaction-rows", type=int, default=10_000)
+    parser.add_argument("--snapshots", type=int, default=500)
+    parser.add_argument("--start-year", type=int, default=START_YEAR)
+    parser.add_argument("--years", type=int, default=YEARS)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    files = writeDataset(
+        args.directory, args.stock_rows, args.transaction_rows,
+        args.snapshots, args.start_year, args.years)
+    for file_name in files.values():
+        print(file_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import numpy as np
+
+from growth_fit import YEARS_PREDICTION, forecastGrowth
+from memoize import memoized
+from period_aggregates import (
+    absoluteYearlyGrowth,
+    percentageGrowth,
+    percentageYearlyGrowth,
+    wealthValues,
+)
+from projection import (
+    TARGET_EQUITY,
+    firstCrossingMonths,
+    isMonotonic,
+    projectEquity,
+)
+
+
+# The calculations of the scripts without reading, printing or plotting.
+# Arguments and results are arrays, dicts of arrays or DataFrames and the
+# results are memoized on the argument values, so notebooks and batch jobs
+# repeating an analysis get the earlier result. The per-year tax figures
+# are imported when used, the projections do not need pandas.
+
+
+@memoized()
+def annualTaxes(stock_df, dividend_df):
+    # Per-year figures and taxes of parsed 9a-report.csv and
+    # transactions-and-notes.csv frames
+    from annual_aggregates import aggregateAnnualData, computeAnnualTaxes
+    return computeAnnualTaxes(aggregateAnnualData(stock_df, dividend_df))
+
+
+@memoized()
+def taxedAnnualData(annual_df):
+    from annual_aggregates import computeAnnualTaxes
+    return computeAnnualTaxes(annual_df)
+
+
+@memoized()
+def wealthHistory(days, months, years, savings, stock_profits):
+    # Date values and year values of snapshots in date order
+    return wealthValues(days, months, years, savings, stock_profits)
+
+
+@memoized()
+def yearlyGrowth(year_values):
+    return {
+        "percentage": percentageYearlyGrowth(
+            year_values, ["years", "stock_profits"],
+            ["stock_profits", "savings"]),
+        "absolute": absoluteYearlyGrowth(year_values, ["years"]),
+    }
+
+
+def yearOverYearChanges(values, has_change):
+    # Percentage change from the previous year, NaN for the first year and
+    # where has_change is False
+    return np.append(np.nan, np.where(
+        has_change, percentageGrowth(values), np.nan))
+
+
+@memoized()
+def cumulativeValues(year_values, last_month):
+    # Whole euros without negative zeros and their year-over-year changes.
+    # The last year has last_month months, the year before the first one
+    # counts as zero.
+    equities = np.trunc(year_values["equities"]) + 0.0
+    savings = np.trunc(year_values["savings"]) + 0.0
+    stock_profits = np.trunc(year_values["stock_profits"]) + 0.0
+    months_a_year = np.full(len(savings), 12)
+    months_a_year[-1] = last_month
+    return {
+        "years": year_values["years"],
+        "equities": equities,
+        "equity_changes": yearOverYearChanges(equities, equities[:-1] != 0),
+        "savings": savings,
+        "monthly_savings": np.diff(savings, prepend=0) / months_a_year,
+        "saving_changes": yearOverYearChanges(savings, savings[:-1] != 0),
+        "stock_profits": stock_profits,
+        "stock_profit_changes": yearOverYearChanges(
+            stock_profits, stock_profits[:-1] > 0),
+    }
+
+
+@memoized()
+def growthForecast(dates_as_numbers, datas, labels, years=YEARS_PREDICTION):
+    return forecastGrowth(dates_as_numbers, datas, labels, years)
+
+
+@memoized()
+def equityProjection(start_equity, monthly_savings, savings_increase_percent,
+                     annual_return_percent, years, target=TARGET_EQUITY):
+    # Monthly paths of projectEquity() and the first month at or above the
+    # target, -1 if never reached
+    projection = projectEquity(
+        start_equity, monthly_savings, savings_increase_percent,
+        annual_return_percent, years)
+    projection["months_to_target"] = firstCrossingMonths(
+        projection["equities"], target,
+        isMonotonic(projection, annual_return_percent))
+    return projection
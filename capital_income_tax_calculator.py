@@ -1,90 +1,77 @@
+import argparse
+import sys
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 from math import sqrt, ceil
 
+from annual_aggregates import (
+    ANNUAL_COLUMNS,
+    DIVIDEND_NAMING_CONVERSION,
+    STOCK_NAMING_CONVERSION,
+    aggregateAnnualData,
+    aggregateStockData,
+    aggregateTransactionTypes,
+    combineAnnualData,
+    computeAnnualTaxes,
+    stockIncomes,
+    taxedIncomes,
+)
+from calculations import taxedAnnualData
+from export_cache import CACHE_DIRECTORY, printCacheReport, readCachedCsv
+from profiling import PROFILE_FORMATS, configureProfiling, printProfile, stage
+from table_renderer import (
+    MACHINE_FORMATS,
+    TABLE_FORMATS,
+    renderTable,
+    writeTable,
+)
+from tax_engine import (
+    BASE_TAX_PERCENTAGE,
+    MARGIN_TAX_PERCENTAGE,
+    MARGIN_TAX_THRESHOLD,
+    N_YEARS_LOSSES_ACCUMULATED,
+    ZERO_TAX_THRESHOLD,
+    singleTaxes,
+    totalTaxes,
+)
+
 
 STOCK_CSV_FILE = "9a-report.csv"
 DIVIDEND_CSV_FILE = "transactions-and-notes.csv"
-BASE_TAX_PERCENTAGE = 30
-MARGIN_TAX_PERCENTAGE = 34
-MARGIN_TAX_THRESHOLD = 30000
-ZERO_TAX_THRESHOLD = 1000
-N_YEARS_LOSSES_ACCUMULATED = 5
-
-# Define here the headers in CSV file
-# 9a-report.csv
-STOCK_NAMING_CONVERSION = {
-    "sell_date": "Luovutusaika",
-    "profit": "Voitto tai tappio EUR",
-    "buy_cost": "Hankintakulut EUR",
-    "sell_cost": "Myyntikulut EUR",
-}
-
-# Define here the headers in CSV file
-# transactions-and-notes.csv
-DIVIDEND_NAMING_CONVERSION = {
-    "date": "Kauppapäivä",
-    "profit": "Summa",
-    "transaction_type": "Tapahtumatyyppi",
-    "dividend": "OSINKO",
-    "tax": "ENNAKKOPIDÄTYS",
-    "loan_interest": "LAINAKORKO",
-    "deposit": ["TALLETUS", "Reaaliaikainen talle"],
-}
+
+# Spaces, non-breaking spaces and thin spaces used as thousands separators
+THOUSANDS_SEPARATORS_PATTERN = r"[\s\u00a0\u2007\u202f\u2009']"
+
+# Column in the per-year frame, table header and bar color
+TABLE_COLUMNS = [
+    ("deposit", "Deposit", "g"),
+    ("buy_cost", "Buy cost", "r"),
+    ("sell_cost", "Sell cost", "r"),
+    ("loan_interest", "Loan interest", "r"),
+    ("loss", "Loss", "r"),
+    ("profit", "Profit", "g"),
+    ("dividend", "Dividend", "g"),
+    ("income", "Income", "rg"),
+    ("paid_dividend_tax", "Paid dividend tax", "r"),
+    ("total_tax", "Total tax", "r"),
+    ("residual_tax", "Residual tax", "r"),
+    ("net_income", "Net income", "rg"),
+]
 
 
 def singleTax(income):
-    if income > MARGIN_TAX_THRESHOLD:
-        base_tax = BASE_TAX_PERCENTAGE * MARGIN_TAX_THRESHOLD
-        margin_tax = MARGIN_TAX_PERCENTAGE * (income - MARGIN_TAX_THRESHOLD)
-        tax = (base_tax + margin_tax) / 100
-    elif income <= ZERO_TAX_THRESHOLD:
-        tax = 0
-    else:
-        tax = BASE_TAX_PERCENTAGE * income / 100
-    return tax
+    return float(singleTaxes(income))
 
 
 def totalTax(incomes):
-    # Calculate income based on previous years losses
-    previous_years_incomes = sum(incomes[-N_YEARS_LOSSES_ACCUMULATED:-1])
-    income = incomes[-1]
-    if previous_years_incomes < 0:
-        income += previous_years_incomes
-
-    # Calculate tax for income
-    return singleTax(income)
+    # Tax of the last year, see tax_engine.totalTaxes() for all years at once
+    return float(totalTaxes(incomes)[-1])
 
 
 def printTable(texts, values):
-    # Compute header length
-    text_lengths = []
-    for i, text in enumerate(texts):
-        text_lengths.append(5 if i == 0 else max(9, len(text)))
-    table_length = sum(text_lengths) + 4 + 3 * max(0, len(text_lengths) - 1)
-
-    # Print header
-    print(table_length * "-")
-    print("| ", end="")
-    for i, text in enumerate(texts):
-        number_of_spaces = max(0, text_lengths[i] - len(text))
-        print("{}{}".format(" " * number_of_spaces, text), end=" | ")
-
-    # Print table
-    print("\n" + table_length * "-")
-    for i in range(len(values[0])):
-        if i == len(values[0]) - 1:
-            print(table_length * "-")
-        print("| ", end="")
-        for j in range(len(values)):
-            value = values[j][i]
-            if type(value) == np.float64 or type(value) == float:
-                value = "{0:.2f}".format(value)
-            number_of_spaces = max(0, text_lengths[j] - len(str(value)))
-            print("{}{}".format(" " * number_of_spaces, value), end=" | ")
-        print()
-    print(table_length * "-")
+    # texts are the column headers and values the columns, the last row is
+    # the totals
+    writeTable(texts, values)
 
 
 def getRedGreenColorMap(data):
@@ -97,7 +84,10 @@ def getRedGreenColorMap(data):
     return tuple(color_map)
 
 
-def plotData(x_labels, datas, titles, colors):
+def plotData(x_labels, datas, titles, colors, show=True):
+    # Imported here so the calculations can be used without matplotlib
+    import matplotlib.pyplot as plt
+
     grid_x = int(sqrt(len(datas)))
     grid_y = ceil(len(datas) / grid_x)
     plt.subplots_adjust(
@@ -143,168 +133,213 @@ def plotData(x_labels, datas, titles, colors):
             value = round(height, 2)
             plt.text(x, y, value, horizontalalignment="center")
         plt.title(title)
-    plt.show()
+    if show:
+        plt.show()
+
+
+def parseDecimals(column):
+    if pd.api.types.is_numeric_dtype(column):
+        return column.astype(np.float64)
+
+    # Finnish format e.g. "1 234,56" with any kind of space as separator
+    column = column.astype(str).str.strip()
+    column = column.str.replace(THOUSANDS_SEPARATORS_PATTERN, "", regex=True)
+    column = column.str.replace("\u2212", "-").str.replace(",", ".")
+    return pd.to_numeric(column.replace("", np.nan)).astype(np.float64)
+
 
+def normaliseAmounts(df, columns):
+    for column in columns:
+        if column in df.columns:
+            df[column] = parseDecimals(df[column])
+    return df
 
-def main():
+
+def readStockCsv(file_name):
+    snc = STOCK_NAMING_CONVERSION
+    with stage("stock_decode") as record:
+        stock_df = pd.read_csv(
+            file_name, header=0, sep="\t", encoding="utf-16", decimal=",")
+        record["rows"] = len(stock_df)
+    with stage("stock_date_parse", len(stock_df)):
+        stock_df[snc["sell_date"]] = pd.to_datetime(
+            stock_df[snc["sell_date"]], format="%d.%m.%Y")
+    with stage("stock_amounts", len(stock_df)):
+        return normaliseAmounts(
+            stock_df, [snc["profit"], snc["buy_cost"], snc["sell_cost"]])
+
+
+def readDividendCsv(file_name):
+    dnc = DIVIDEND_NAMING_CONVERSION
+    with stage("dividend_decode") as record:
+        dividend_df = pd.read_csv(
+            file_name, header=0, sep="\t", encoding="utf-16", decimal=",")
+        record["rows"] = len(dividend_df)
+    with stage("dividend_date_parse", len(dividend_df)):
+        dividend_df[dnc["date"]] = pd.to_datetime(
+            dividend_df[dnc["date"]], format="%Y-%m-%d")
+    with stage("dividend_amounts", len(dividend_df)):
+        return normaliseAmounts(
+            dividend_df, [dnc["profit"], dnc["quantity"], dnc["fees"]])
+
+
+def readCsvChunks(file_name, columns, chunksize, date_column, date_format,
+                  amount_columns, category_columns=()):
+    # Only the needed columns, amounts as integer cents
+    chunks = pd.read_csv(
+        file_name, header=0, sep="\t", encoding="utf-16", decimal=",",
+        usecols=columns, chunksize=chunksize,
+        dtype={column: "category" for column in category_columns})
+    for chunk in chunks:
+        chunk[date_column] = pd.to_datetime(
+            chunk[date_column], format=date_format)
+        for column in amount_columns:
+            chunk[column] = (parseDecimals(chunk[column]).fillna(0) * 100) \
+                .round().astype(np.int64)
+        yield chunk
+
+
+def accumulate(total, chunk_total):
+    return chunk_total if total is None else total.add(
+        chunk_total, fill_value=0)
+
+
+def aggregateAnnualDataInChunks(stock_csv_file, dividend_csv_file,
+                                chunksize):
     snc = STOCK_NAMING_CONVERSION
     dnc = DIVIDEND_NAMING_CONVERSION
 
-    # Read CSV
-    stock_df = pd.read_csv(
-        STOCK_CSV_FILE, header=0, sep="\t", encoding="utf-16", decimal=",")
-    dividend_df = pd.read_csv(
-        DIVIDEND_CSV_FILE, header=0, sep="\t", encoding="utf-16", decimal=",")
-    stock_df[snc["sell_date"]] = pd.to_datetime(
-        stock_df[snc["sell_date"]], format="%d.%m.%Y")
-    dividend_df[dnc["date"]] = pd.to_datetime(
-        dividend_df[dnc["date"]], format="%Y-%m-%d")
-    min_year_stock = min(stock_df[snc["sell_date"]]).year
-    max_year_stock = max(stock_df[snc["sell_date"]]).year
-    min_year_dividend = min(dividend_df[dnc["date"]]).year
-    max_year_dividend = max(dividend_df[dnc["date"]]).year
-    min_year = min(min_year_stock, min_year_dividend)
-    max_year = max(max_year_stock, max_year_dividend)
-
-    # Data storage
-    years = list(range(min_year, max_year + 1))
-    deposits = []
-    buy_costs = []
-    sell_costs = []
-    loan_interests = []
-    losses = []
-    profits = []
-    dividends = []
-    paid_dividend_taxes = []
-    taxed_incomes = []
-    stock_incomes = []
-    total_taxes = []
-    net_incomes = []
-
-    # Process annual info
-    for year in years:
-
-        # Pick annual data
-        rows_stock = stock_df[
-            (stock_df[snc["sell_date"]] >= f"01-01-{year}") &
-            (stock_df[snc["sell_date"]] <= f"31-12-{year}")
-        ]
-        rows_dividend = dividend_df[
-            (dividend_df[dnc["date"]] >= f"01-01-{year}") &
-            (dividend_df[dnc["date"]] <= f"31-12-{year}")
-        ]
-
-        # Read data
-        buy_cost = rows_stock[snc["buy_cost"]].astype(float).to_numpy().sum()
-        sell_cost = rows_stock[snc["sell_cost"]].astype(float).to_numpy().sum()
-        loss = abs(rows_stock[rows_stock[snc["profit"]] < 0][
-            snc["profit"]].to_numpy().sum())
-        profit = rows_stock[rows_stock[snc["profit"]] >= 0][
-            snc["profit"]].to_numpy().sum()
-
-        try:
-            deposit = sum([sum([float(d.replace(',', '.').replace(' ', '')) for d in rows_dividend[
-                rows_dividend[dnc["transaction_type"]] ==
-                deposit_name][dnc["profit"]].to_numpy()]) for deposit_name in dnc["deposit"]])
-            dividend = sum([float(d.replace(',', '.')) for d in rows_dividend[
-                rows_dividend[dnc["transaction_type"]] ==
-                dnc["dividend"]][dnc["profit"]].to_numpy()])
-            loan_interest = abs(sum([float(d.replace(',', '.')) for d in rows_dividend[
-                rows_dividend[dnc["transaction_type"]] ==
-                dnc["loan_interest"]][dnc["profit"]].to_numpy()]))
-            paid_dividend_tax = abs(sum([float(pdt.replace(',', '.')) for pdt in
-                rows_dividend[rows_dividend[dnc["transaction_type"]] ==
-                dnc["tax"]][dnc["profit"]].to_numpy()]))
-        except AttributeError:
-            deposit = sum([sum([float(d) for d in rows_dividend[
-                rows_dividend[dnc["transaction_type"]] ==
-                deposit_name][dnc["profit"]].to_numpy()]) for deposit_name in dnc["deposit"]])
-            dividend = sum([float(d) for d in rows_dividend[
-                rows_dividend[dnc["transaction_type"]] ==
-                dnc["dividend"]][dnc["profit"]].to_numpy()])
-            loan_interest = abs(sum([float(d) for d in rows_dividend[
-                rows_dividend[dnc["transaction_type"]] ==
-                dnc["loan_interest"]][dnc["profit"]].to_numpy()]))
-            paid_dividend_tax = abs(sum([float(pdt) for pdt in
-                rows_dividend[rows_dividend[dnc["transaction_type"]] ==
-                dnc["tax"]][dnc["profit"]].to_numpy()]))
-
-        # Calculate income and tax
-        stock_income = profit - buy_cost - sell_cost - loan_interest - loss
-        stock_incomes.append(stock_income)
-        taxed_incomes.append(stock_income + 0.85 * dividend)
-        total_tax = totalTax(taxed_incomes)
-        net_income = stock_income + dividend - total_tax
-
-        # Store data
-        deposits.append(deposit)
-        buy_costs.append(buy_cost)
-        sell_costs.append(sell_cost)
-        loan_interests.append(loan_interest)
-        profits.append(profit)
-        dividends.append(dividend)
-        paid_dividend_taxes.append(paid_dividend_tax)
-        losses.append(loss)
-        total_taxes.append(total_tax)
-        net_incomes.append(net_income)
-
-    total_incomes = [a + b for (a, b) in zip(stock_incomes, dividends)]
-    residual_taxes = [
-        max(0, a - b) for (a, b) in zip(total_taxes, paid_dividend_taxes)]
-
-    # Print
-    texts = [
-        "Year",
-        "Deposit",
-        "Buy cost",
-        "Sell cost",
-        "Loan interest",
-        "Loss",
-        "Profit",
-        "Dividend",
-        "Income",
-        "Paid dividend tax",
-        "Total tax",
-        "Residual tax",
-        "Net income",
-    ]
-    values = [
-        years,
-        deposits,
-        buy_costs,
-        sell_costs,
-        loan_interests,
-        losses,
-        profits,
-        dividends,
-        total_incomes,
-        paid_dividend_taxes,
-        total_taxes,
-        residual_taxes,
-        net_incomes,
-    ]
-    colors = [
-        "g",
-        "r",
-        "r",
-        "r",
-        "r",
-        "g",
-        "g",
-        "rg",
-        "r",
-        "r",
-        "r",
-        "rg",
-    ]
-    plotData(years, values[1:], texts[1:], colors)
+    # Running per-year sums, memory is bounded by the chunk size
+    stock_annual = None
+    amount_columns = [snc["profit"], snc["buy_cost"], snc["sell_cost"]]
+    for chunk in readCsvChunks(
+            stock_csv_file, [snc["sell_date"]] + amount_columns, chunksize,
+            snc["sell_date"], "%d.%m.%Y", amount_columns):
+        stock_annual = accumulate(stock_annual, aggregateStockData(chunk))
+
+    transaction_annual = None
+    for chunk in readCsvChunks(
+            dividend_csv_file,
+            [dnc["date"], dnc["transaction_type"], dnc["profit"]], chunksize,
+            dnc["date"], "%Y-%m-%d", [dnc["profit"]],
+            [dnc["transaction_type"]]):
+        transaction_annual = accumulate(
+            transaction_annual, aggregateTransactionTypes(chunk))
+
+    annual_df = combineAnnualData(
+        stock_annual.fillna(0), transaction_annual.fillna(0))
+    return annual_df / 100
+
+
+def annualTable(annual_df, table_format="ascii"):
+    # Totals only for people, other programs can sum the columns
+    texts = ["Year"] + [text for _, text, _ in TABLE_COLUMNS]
+    values = [list(annual_df.index)] + [
+        list(annual_df[column]) for column, _, _ in TABLE_COLUMNS]
+    if table_format in MACHINE_FORMATS:
+        return renderTable(texts, values, table_format)
     for i in range(len(values)):
         if i == 0:
             total = ["Total"]
         else:
             total = [sum(values[i])]
         values[i] = values[i].copy() + total
-    printTable(texts, values)
+    return renderTable(texts, values, table_format)
+
+
+def printAnnualTable(annual_df, table_format="ascii"):
+    sys.stdout.write(annualTable(annual_df, table_format))
+
+
+def plotAnnualData(annual_df, show=True):
+    plotData(
+        list(annual_df.index),
+        [list(annual_df[column]) for column, _, _ in TABLE_COLUMNS],
+        [text for _, text, _ in TABLE_COLUMNS],
+        [color for _, _, color in TABLE_COLUMNS],
+        show)
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Calculate annual capital income taxes")
+    parser.add_argument("--stock-csv", default=STOCK_CSV_FILE)
+    parser.add_argument("--dividend-csv", default=DIVIDEND_CSV_FILE)
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Parse the CSV files without reading or writing the cache")
+    parser.add_argument(
+        "--refresh-cache", action="store_true",
+        help="Invalidate cached CSV files and parse them again")
+    parser.add_argument("--cache-directory", default=CACHE_DIRECTORY)
+    parser.add_argument(
+        "--cache-report", action="store_true",
+        help="Print cache hits and misses to stderr")
+    parser.add_argument(
+        "--ledger",
+        help="Read annual figures from a ledger built with ledger.py")
+    parser.add_argument(
+        "--chunksize", type=int,
+        help="Stream the CSV files in chunks of this many rows")
+    parser.add_argument(
+        "--format", choices=TABLE_FORMATS, default="ascii",
+        help="Print the table as text or for other programs")
+    parser.add_argument(
+        "--profile", nargs="?", const="table", choices=PROFILE_FORMATS,
+        help="Print the time, rows and memory of every stage to stderr")
+    parser.add_argument(
+        "--profile-stage", help="Dump a cProfile of this stage to STAGE.prof")
+    return parser.parse_args(argv)
+
+
+def readCsvFiles(args):
+    if args.no_cache:
+        return readStockCsv(args.stock_csv), readDividendCsv(args.dividend_csv)
+    stock_df = readCachedCsv(
+        args.stock_csv, readStockCsv, args.cache_directory,
+        args.refresh_cache)
+    dividend_df = readCachedCsv(
+        args.dividend_csv, readDividendCsv, args.cache_directory,
+        args.refresh_cache)
+    if args.cache_report:
+        printCacheReport()
+    return stock_df, dividend_df
+
+
+def readAnnualData(args):
+    if args.ledger:
+        from ledger import readAnnualAggregates
+        with stage("read_ledger"):
+            return readAnnualAggregates(args.ledger)
+    if args.chunksize:
+        with stage("read_chunks"):
+            return aggregateAnnualDataInChunks(
+                args.stock_csv, args.dividend_csv, args.chunksize)
+    with stage("read_csv_files"):
+        stock_df, dividend_df = readCsvFiles(args)
+    with stage("aggregation", len(stock_df) + len(dividend_df)):
+        return aggregateAnnualData(stock_df, dividend_df)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    configureProfiling(args.profile, args.profile_stage)
+
+    # Read CSV or ledger
+    annual_df = readAnnualData(args)
+
+    # Process annual info
+    with stage("tax", len(annual_df)):
+        annual_df = taxedAnnualData(annual_df)
+
+    # Plot and print, only print for other programs
+    if args.format not in MACHINE_FORMATS:
+        with stage("plot"):
+            plotAnnualData(annual_df)
+    with stage("table", len(annual_df)):
+        printAnnualTable(annual_df, args.format)
+    printProfile()
 
 
-main()
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import numpy as np
+
+
+# Series this long or shorter are plotted as they are
+MIN_DECIMATED_POINTS = 1000
+LTTB_POINTS_PER_PIXEL = 2
+
+
+def visibleSlice(x, x_range=None):
+    # Points inside the range and one more on both sides so the line
+    # continues to the edges
+    if x_range is None:
+        return slice(0, len(x))
+    x_min, x_max = sorted(x_range)
+    start = max(np.searchsorted(x, x_min, side="left") - 1, 0)
+    end = min(np.searchsorted(x, x_max, side="right") + 1, len(x))
+    return slice(start, end)
+
+
+def minMaxIndices(x, y, n_buckets):
+    # First, last, minimum and maximum point of every pixel wide bucket, the
+    # drawn line covers the same pixels as with every point
+    n_points = len(x)
+    if n_points <= 4 * n_buckets:
+        return np.arange(n_points)
+    x_span = x[-1] - x[0]
+    buckets = np.minimum(
+        ((x - x[0]) / (x_span if x_span > 0 else 1) * n_buckets).astype(
+            np.int64), n_buckets - 1)
+    is_start = np.empty(n_points, dtype=bool)
+    is_start[0] = True
+    is_start[1:] = buckets[1:] != buckets[:-1]
+    starts = np.flatnonzero(is_start)
+    bucket_indices = np.cumsum(is_start) - 1
+    point_indices = np.arange(n_points)
+
+    # Missing values are skipped, a bucket of only them keeps its first and
+    # last point
+    minimums = np.fmin.reduceat(y, starts)
+    maximums = np.fmax.reduceat(y, starts)
+    first_minimums = np.minimum.reduceat(np.where(
+        y == minimums[bucket_indices], point_indices, n_points), starts)
+    first_maximums = np.minimum.reduceat(np.where(
+        y == maximums[bucket_indices], point_indices, n_points), starts)
+    indices = np.unique(np.concatenate([
+        starts, np.append(starts[1:], n_points) - 1, first_minimums,
+        first_maximums]))
+    return indices[indices < n_points]
+
+
+def lttbIndices(x, y, n_selected):
+    # Largest-Triangle-Three-Buckets: the first and last point and from every
+    # bucket between them the point making the largest triangle with the
+    # previously selected point and the average of the next bucket
+    n_points = len(x)
+    if n_selected >= n_points or n_selected < 3:
+        return np.arange(n_points)
+    edges = np.linspace(1, n_points - 1, n_selected - 1).astype(np.int64)
+    next_starts = edges[1:]
+    next_ends = np.append(edges[2:], n_points)
+    x_sums = np.cumsum(np.append(0, x))
+    y_sums = np.cumsum(np.append(0, y))
+    counts = next_ends - next_starts
+    next_x = (x_sums[next_ends] - x_sums[next_starts]) / counts
+    next_y = (y_sums[next_ends] - y_sums[next_starts]) / counts
+
+    indices = np.empty(n_selected, dtype=np.int64)
+    indices[0] = 0
+    indices[-1] = n_points - 1
+    selected = 0
+    for i in range(n_selected - 2):
+        start, end = edges[i], edges[i + 1]
+        areas = np.abs(
+            (x[selected] - next_x[i]) * (y[start:end] - y[selected]) -
+            (x[selected] - x[start:end]) * (next_y[i] - y[selected]))
+        selected = start + int(np.argmax(areas))
+        indices[i + 1] = selected
+    return indices
+
+
+DECIMATION_METHODS = {
+    "minmax": minMaxIndices,
+    "lttb": lambda x, y, pixels: lttbIndices(
+        x, y, LTTB_POINTS_PER_PIXEL * pixels),
+}
+
+
+def decimationIndices(x, y, pixels, method="minmax", x_range=None):
+    # Indices of the points to draw of x sorted series
+    visible = visibleSlice(x, x_range)
+    n_visible = visible.stop - visible.start
+    if n_visible <= max(MIN_DECIMATED_POINTS, 2 * pixels):
+        return np.arange(visible.start, visible.stop)
+    return visible.start + DECIMATION_METHODS[method](
+        x[visible], y[visible], max(pixels, 1))
+
+
+def pixelWidth(ax):
+    return int(np.ceil(ax.get_window_extent().width))
+
+
+def plotDecimated(ax, x, y, *args, method="minmax", **kwargs):
+    # Plot as ax.plot(x, y, ...) with as many points as the axes has pixels.
+    # When the x limits change, e.g. on zoom or pan, the visible range is
+    # decimated again from the full series.
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    indices = decimationIndices(x, y, pixelWidth(ax), method)
+    line, = ax.plot(x[indices], y[indices], *args, **kwargs)
+
+    def redecimate(ax):
+        indices = decimationIndices(
+            x, y, pixelWidth(ax), method, ax.get_xlim())
+        line.set_data(x[indices], y[indices])
+
+    ax.callbacks.connect("xlim_changed", redecimate)
+    return line
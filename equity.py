@@ -1,19 +1,57 @@
-import sys
+import argparse
+import datetime
 import yaml
 
-with open("finance_info.yaml") as file:
-    yaml_file = yaml.load(file, Loader=yaml.FullLoader)
-PORTFOLIO_BALANCE = int(sys.argv[1])
-CASH = int(sys.argv[2])
-PORTFOLIO_INVESTED = yaml_file["PORTFOLIO_INVESTED"]
-LOAN = yaml_file["STUDY_LOAN_LEFT"]
-LOAN_BENEFIT = yaml_file["LOAN_BENEFIT"]
-STOCK_TAX = yaml_file["STOCK_TAX"]
-DIVIDEND_TAX = yaml_file["DIVIDEND_TAX"]
-
-print(
-    "Savings:           ",
-    PORTFOLIO_INVESTED + CASH + STOCK_TAX - LOAN - LOAN_BENEFIT)
-print(
-    "Investment profits:",
-    PORTFOLIO_BALANCE - PORTFOLIO_INVESTED + LOAN_BENEFIT - STOCK_TAX)
+from snapshot_store import SNAPSHOT_FILE, appendSnapshot
+
+
+FINANCE_INFO_FILE = "finance_info.yaml"
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Calculate savings and investment profits")
+    parser.add_argument("portfolio_balance", type=int)
+    parser.add_argument("cash", type=int)
+    parser.add_argument(
+        "--date", type=datetime.date.fromisoformat,
+        default=datetime.date.today(),
+        help="Date of the snapshot, YYYY-MM-DD, today by default")
+    parser.add_argument("--store", default=SNAPSHOT_FILE)
+    parser.add_argument(
+        "--no-store", action="store_true",
+        help="Only print the snapshot")
+    return parser.parse_args(argv)
+
+
+def readFinanceInfo(file_name=FINANCE_INFO_FILE):
+    with open(file_name) as file:
+        return yaml.load(file, Loader=yaml.FullLoader)
+
+
+def computeEquity(portfolio_balance, cash, finance_info):
+    portfolio_invested = finance_info["PORTFOLIO_INVESTED"]
+    loan = finance_info["STUDY_LOAN_LEFT"]
+    loan_benefit = finance_info["LOAN_BENEFIT"]
+    stock_tax = finance_info["STOCK_TAX"]
+    savings = portfolio_invested + cash + stock_tax - loan - loan_benefit
+    investment_profits = \
+        portfolio_balance - portfolio_invested + loan_benefit - stock_tax
+    return savings, investment_profits
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    finance_info = readFinanceInfo()
+    savings, investment_profits = computeEquity(
+        args.portfolio_balance, args.cash, finance_info)
+    print("Savings:           ", savings)
+    print("Investment profits:", investment_profits)
+    if not args.no_store:
+        appendSnapshot(
+            args.date, savings, investment_profits, args.portfolio_balance,
+            args.cash, finance_info, args.store)
+
+
+if __name__ == "__main__":
+    main()
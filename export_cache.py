@@ -0,0 +1,93 @@
+import hashlib
+import json
+import os
+import sys
+
+import pandas as pd
+
+from atomic_write import writeAtomically
+
+
+CACHE_DIRECTORY = ".cache"
+
+# Increase when the parsed frames change so old cache entries are not used
+CACHE_VERSION = 2
+HASH_BLOCK_SIZE = 1 << 20
+
+# Lookups done in this process, see cacheReport()
+CACHE_STATISTICS = {
+    "hits": 0,
+    "misses": 0,
+    "files": [],
+}
+
+
+def fileSignature(file_name):
+    stat = os.stat(file_name)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def fileHash(file_name):
+    sha256 = hashlib.sha256()
+    with open(file_name, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            sha256.update(block)
+    return sha256.hexdigest()
+
+
+def readCachedCsv(file_name, read_function, cache_directory=CACHE_DIRECTORY,
+                  refresh=False):
+    # Metadata is stored per source path, parsed frames per content hash so
+    # identical exports in different directories share one cache entry
+    os.makedirs(cache_directory, exist_ok=True)
+    source_key = hashlib.sha1(
+        os.path.abspath(file_name).encode("utf-8")).hexdigest()
+    metadata_path = os.path.join(cache_directory, f"{source_key}.json")
+    size, mtime_ns = fileSignature(file_name)
+
+    metadata = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path) as file:
+            metadata = json.load(file)
+
+    # Unchanged size and modification time, no need to hash the file
+    if metadata.get("size") == size and metadata.get("mtime_ns") == mtime_ns:
+        content_hash = metadata["sha256"]
+    else:
+        content_hash = fileHash(file_name)
+    data_path = os.path.join(
+        cache_directory,
+        f"{read_function.__name__}-v{CACHE_VERSION}-{content_hash}.pkl")
+
+    if not refresh and os.path.exists(data_path):
+        df = pd.read_pickle(data_path)
+        status = "hits"
+    else:
+        df = read_function(file_name)
+        writeAtomically(data_path, df.to_pickle)
+        status = "misses"
+
+    def writeMetadata(path):
+        with open(path, "w") as file:
+            json.dump(
+                {"size": size, "mtime_ns": mtime_ns, "sha256": content_hash},
+                file)
+
+    writeAtomically(metadata_path, writeMetadata)
+    CACHE_STATISTICS[status] += 1
+    CACHE_STATISTICS["files"].append(
+        (file_name, "hit" if status == "hits" else "miss"))
+    return df
+
+
+def cacheReport():
+    lines = [
+        f"{status:>4}: {file_name}"
+        for file_name, status in CACHE_STATISTICS["files"]]
+    lines.append("Cache hits: {}, misses: {}".format(
+        CACHE_STATISTICS["hits"], CACHE_STATISTICS["misses"]))
+    return "\n".join(lines)
+
+
+def printCacheReport(file=sys.stderr):
+    print(cacheReport(), file=file)
@@ -0,0 +1,52 @@
+import argparse
+import importlib
+
+
+# Subcommand, module whose main() it runs and help text. Modules are
+# imported only when their subcommand is run, so heavy libraries are never
+# loaded by subcommands that do not need them.
+SUBCOMMANDS = {
+    "equity": ("equity", "Calculate savings and investment profits"),
+    "plot": ("plot_wealth_chart", "Plot financial progress"),
+    "tax": ("capital_income_tax_calculator", "Calculate capital income tax"),
+    "project": ("progress_estimation", "Estimate financial progress"),
+    "forecast": ("growth_fit", "Print the growth forecast as JSON"),
+    "simulate": ("monte_carlo", "Simulate progress with random returns"),
+    "sweep": ("parameter_sweep", "Evaluate a grid of projections"),
+    "ingest": ("ledger", "Merge Nordnet exports into the ledger"),
+    "lots": ("lot_engine", "Print open lots or the tax of selling them"),
+    "report": ("report", "Render every chart to files"),
+    "batch": ("batch", "Calculate capital income tax of several accounts"),
+    "snapshots": ("snapshot_store", "Import or print wealth snapshots"),
+    "periods": ("period_aggregates", "Print year, quarter or month ends"),
+    "watch": ("watch", "Update the reports when the inputs change"),
+    "serve": ("api_server", "Serve the figures as JSON over HTTP"),
+    "compare": ("scenario_comparison", "Compare savings plans with history"),
+}
+
+
+def importSubcommand(command):
+    return importlib.import_module(SUBCOMMANDS[command][0])
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Financial progress tools",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="subcommands:\n" + "\n".join(
+            f"  {command:<10}{help_text}"
+            for command, (_, help_text) in SUBCOMMANDS.items()))
+    parser.add_argument("command", choices=SUBCOMMANDS, metavar="command")
+    parser.add_argument(
+        "arguments", nargs=argparse.REMAINDER,
+        help="Arguments of the subcommand, see <command> --help")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    importSubcommand(args.command).main(args.arguments)
+
+
+if __name__ == "__main__":
+    main()
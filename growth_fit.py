@@ -0,0 +1,170 @@
+import argparse
+import json
+from statistics import NormalDist
+
+import numpy as np
+
+
+YEARS_PREDICTION = 3
+CONFIDENCE = 0.95
+PREDICTION_POINTS = 100
+
+
+def weightedTerms(x, log_ys, weights):
+    # Per point terms of the least squares sums
+    return {
+        "n": weights,
+        "x": weights * x,
+        "y": weights * log_ys,
+        "xx": weights * x * x,
+        "xy": weights * x * log_ys,
+        "yy": weights * log_ys * log_ys,
+    }
+
+
+def solveFits(sums, x_offset):
+    # Least squares line log(y) = intercept + slope * x for every set of sums
+    n = sums["n"]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        x_mean = sums["x"] / n
+        y_mean = sums["y"] / n
+        sxx = sums["xx"] - n * x_mean ** 2
+        sxy = sums["xy"] - n * x_mean * y_mean
+        syy = sums["yy"] - n * y_mean ** 2
+        slopes = sxy / sxx
+        residual_variance = np.maximum(syy - slopes * sxy, 0) / (n - 2)
+    return {
+        "slopes": slopes,
+        "intercepts": y_mean - slopes * (x_mean + x_offset),
+        "x_mean": x_mean + x_offset,
+        "sxx": sxx,
+        "n": n,
+        "residual_std": np.sqrt(residual_variance),
+    }
+
+
+def logValues(ys):
+    # Zero and negative values can not be fitted in log space, they are
+    # left out of the fit instead
+    ys = np.atleast_2d(np.asarray(ys, dtype=float))
+    weights = (np.isfinite(ys) & (ys > 0)).astype(float)
+    log_ys = np.log(np.where(weights > 0, ys, 1))
+    return log_ys, weights
+
+
+def fitLogLinear(x, ys):
+    # All series (rows of ys) are fitted in one batched solve
+    x = np.asarray(x, dtype=float)
+    log_ys, weights = logValues(ys)
+    x_offset = x.mean()
+    terms = weightedTerms(x - x_offset, log_ys, weights)
+    return solveFits(
+        {key: values.sum(axis=-1) for key, values in terms.items()}, x_offset)
+
+
+def rollingFits(x, ys, window):
+    # Fits of every window of consecutive points, (series, windows) arrays
+    x = np.asarray(x, dtype=float)
+    log_ys, weights = logValues(ys)
+    x_offset = x.mean()
+    terms = weightedTerms(x - x_offset, log_ys, weights)
+    window_sums = {}
+    for key, values in terms.items():
+        cumulative = np.concatenate(
+            [np.zeros(values.shape[:-1] + (1,)), np.cumsum(values, axis=-1)],
+            axis=-1)
+        window_sums[key] = cumulative[..., window:] - cumulative[..., :-window]
+    fits = solveFits(window_sums, x_offset)
+    fits["window_ends"] = x[window - 1:]
+    return fits
+
+
+def predict(fits, x, confidence=CONFIDENCE):
+    # Prediction and its interval for every fit at the points x
+    x = np.asarray(x, dtype=float)
+    slopes = fits["slopes"][..., None]
+    log_predictions = fits["intercepts"][..., None] + slopes * x
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        standard_errors = fits["residual_std"][..., None] * np.sqrt(
+            1 + 1 / fits["n"][..., None] +
+            (x - fits["x_mean"][..., None]) ** 2 / fits["sxx"][..., None])
+    return {
+        "prediction": np.exp(log_predictions),
+        "lower": np.exp(log_predictions - z * standard_errors),
+        "upper": np.exp(log_predictions + z * standard_errors),
+    }
+
+
+def forecastGrowth(dates_as_numbers, datas, labels,
+                   years=YEARS_PREDICTION, confidence=CONFIDENCE,
+                   n_points=PREDICTION_POINTS):
+    dates_as_numbers = np.asarray(dates_as_numbers, dtype=float)
+    fits = fitLogLinear(dates_as_numbers, np.array(datas, dtype=float))
+    fitted_x = np.linspace(
+        dates_as_numbers[0], 366 * years + dates_as_numbers[-1], n_points)
+    predictions = predict(fits, fitted_x, confidence)
+    forecast = {"dates_as_numbers": fitted_x, "series": {}}
+    for i, label in enumerate(labels):
+        forecast["series"][label] = {
+            "annual_growth_percent":
+                100 * (np.exp(365.25 * fits["slopes"][i]) - 1),
+            "prediction": predictions["prediction"][i],
+            "lower": predictions["lower"][i],
+            "upper": predictions["upper"][i],
+        }
+    return forecast
+
+
+def rollingGrowth(dates_as_numbers, datas, labels, window):
+    # Annual growth fitted over every window of consecutive snapshots
+    fits = rollingFits(dates_as_numbers, np.array(datas, dtype=float), window)
+    growth = {"dates_as_numbers": fits["window_ends"], "series": {}}
+    for i, label in enumerate(labels):
+        growth["series"][label] = \
+            100 * (np.exp(365.25 * fits["slopes"][i]) - 1)
+    return growth
+
+
+def toJson(value):
+    if isinstance(value, dict):
+        return {key: toJson(item) for key, item in value.items()}
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def readCommandLineArguments(argv=None):
+    from period_aggregates import CSV_FILE_NAME
+    parser = argparse.ArgumentParser(
+        description="Print the wealth growth forecast as JSON")
+    parser.add_argument("csv_file_name", nargs="?", default=CSV_FILE_NAME)
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--years", type=float, default=YEARS_PREDICTION)
+    parser.add_argument("--confidence", type=float, default=CONFIDENCE)
+    parser.add_argument("--points", type=int, default=PREDICTION_POINTS)
+    parser.add_argument(
+        "--window", type=int,
+        help="Also fit annual growth over windows of this many snapshots")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    from plot_wealth_chart import readWealthData
+    date_values, _ = readWealthData(args.csv_file_name, args.delimiter)
+    datas = [date_values["savings"], date_values["equities"]]
+    labels = ["savings", "equities"]
+    forecast = forecastGrowth(
+        date_values["dates_as_numbers"], datas, labels, args.years,
+        args.confidence, args.points)
+    if args.window:
+        forecast["rolling_growth"] = rollingGrowth(
+            date_values["dates_as_numbers"], datas, labels, args.window)
+    print(json.dumps(toJson(forecast)))
+
+
+if __name__ == "__main__":
+    main()
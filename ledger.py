@@ -0,0 +1,234 @@
+import argparse
+import sqlite3
+
+import pandas as pd
+
+from capital_income_tax_calculator import (
+    ANNUAL_COLUMNS,
+    DIVIDEND_CSV_FILE,
+    DIVIDEND_NAMING_CONVERSION,
+    STOCK_CSV_FILE,
+    STOCK_NAMING_CONVERSION,
+    aggregateAnnualData,
+    readDividendCsv,
+    readStockCsv,
+)
+from export_cache import CACHE_DIRECTORY, readCachedCsv
+
+
+LEDGER_FILE = "ledger.sqlite"
+
+# Ledger column and the key of the naming conversion it is read from
+STOCK_LEDGER_COLUMNS = {
+    "sell_date": "sell_date",
+    "profit": "profit",
+    "buy_cost": "buy_cost",
+    "sell_cost": "sell_cost",
+}
+DIVIDEND_LEDGER_COLUMNS = {
+    "date": "date",
+    "transaction_type": "transaction_type",
+    "profit": "profit",
+}
+
+# Columns that tell transactions apart in exports without an Id column,
+# besides the ledger columns
+STOCK_KEY_COLUMNS = ["security"]
+DIVIDEND_KEY_COLUMNS = ["security", "quantity", "price"]
+
+# Version of the transaction keys, stored as the user_version of the
+# ledger. Keys of other versions would not match the keys of new imports.
+LEDGER_VERSION = 2
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS stock_transactions (
+    transaction_key TEXT PRIMARY KEY,
+    year INTEGER NOT NULL,
+    sell_date TEXT NOT NULL,
+    profit REAL,
+    buy_cost REAL,
+    sell_cost REAL
+);
+CREATE INDEX IF NOT EXISTS stock_transactions_year
+    ON stock_transactions (year);
+CREATE TABLE IF NOT EXISTS dividend_transactions (
+    transaction_key TEXT PRIMARY KEY,
+    year INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    transaction_type TEXT,
+    profit REAL
+);
+CREATE INDEX IF NOT EXISTS dividend_transactions_year
+    ON dividend_transactions (year);
+CREATE TABLE IF NOT EXISTS annual_aggregates (
+    year INTEGER PRIMARY KEY,
+    {}
+);
+""".format(",\n    ".join(f"{column} REAL" for column in ANNUAL_COLUMNS))
+
+
+def openLedger(file_name=LEDGER_FILE):
+    connection = sqlite3.connect(file_name)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def checkLedgerVersion(connection, file_name):
+    # New ledgers get the current version, older keys can not be matched
+    version, = connection.execute("PRAGMA user_version").fetchone()
+    if version == LEDGER_VERSION:
+        return
+    has_rows, = connection.execute(
+        "SELECT EXISTS (SELECT 1 FROM stock_transactions) OR "
+        "EXISTS (SELECT 1 FROM dividend_transactions)").fetchone()
+    if has_rows:
+        raise ValueError(
+            f"Ledger ({file_name}) has transaction keys of an older "
+            "version, import the exports into a new ledger")
+    connection.execute(f"PRAGMA user_version = {LEDGER_VERSION}")
+
+
+def transactionKeys(df, rows, naming_conversion, key_columns):
+    # Nordnet's transaction Id when the export has one. Otherwise a hash of
+    # the ledger and key columns, identical rows are then told apart by
+    # their order of appearance in the export.
+    id_column = naming_conversion.get("id")
+    if id_column in df.columns:
+        return [f"id-{transaction_id}" for transaction_id in df[id_column]]
+    hashed = rows.reset_index(drop=True)
+    for key in key_columns:
+        if naming_conversion[key] in df.columns:
+            hashed[key] = df[naming_conversion[key]].to_numpy()
+    row_hashes = pd.util.hash_pandas_object(hashed, index=False)
+    occurrences = row_hashes.groupby(row_hashes).cumcount()
+    return [
+        f"{row_hash:016x}-{occurrence}"
+        for row_hash, occurrence in zip(row_hashes, occurrences)]
+
+
+def toLedgerRows(df, naming_conversion, ledger_columns, date_column,
+                 key_columns=()):
+    rows = pd.DataFrame({
+        column: df[naming_conversion[key]]
+        for column, key in ledger_columns.items()})
+    rows.insert(0, "transaction_key", transactionKeys(
+        df, rows, naming_conversion, key_columns))
+    rows.insert(1, "year", rows[date_column].dt.year)
+    rows[date_column] = rows[date_column].dt.strftime("%Y-%m-%d")
+    return rows
+
+
+def insertNewRows(connection, table, rows):
+    # Years of the rows that are not yet in the ledger
+    connection.execute(f"DROP TABLE IF EXISTS temp.incoming_{table}")
+    connection.execute(
+        f"CREATE TEMP TABLE incoming_{table} AS "
+        f"SELECT * FROM {table} WHERE 0")
+    columns = ", ".join(rows.columns)
+    placeholders = ", ".join("?" * len(rows.columns))
+    connection.executemany(
+        f"INSERT INTO incoming_{table} ({columns}) VALUES ({placeholders})",
+        rows.itertuples(index=False, name=None))
+    new_rows, = connection.execute(
+        f"SELECT COUNT(*) FROM incoming_{table} WHERE transaction_key NOT IN "
+        f"(SELECT transaction_key FROM {table})").fetchone()
+    years = {year for year, in connection.execute(
+        f"SELECT DISTINCT year FROM incoming_{table} WHERE transaction_key "
+        f"NOT IN (SELECT transaction_key FROM {table})")}
+    connection.execute(
+        f"INSERT OR IGNORE INTO {table} SELECT * FROM incoming_{table}")
+    connection.execute(f"DROP TABLE temp.incoming_{table}")
+    return new_rows, years
+
+
+def readLedgerRows(connection, table, naming_conversion, ledger_columns,
+                   date_column, years):
+    placeholders = ", ".join("?" * len(years))
+    df = pd.read_sql_query(
+        "SELECT {} FROM {} WHERE year IN ({})".format(
+            ", ".join(ledger_columns), table, placeholders),
+        connection, params=list(years))
+    df[date_column] = pd.to_datetime(df[date_column], format="%Y-%m-%d")
+    return df.rename(columns={
+        column: naming_conversion[key]
+        for column, key in ledger_columns.items()})
+
+
+def updateAnnualAggregates(connection, years):
+    if not years:
+        return
+    years = sorted(years)
+    stock_df = readLedgerRows(
+        connection, "stock_transactions", STOCK_NAMING_CONVERSION,
+        STOCK_LEDGER_COLUMNS, "sell_date", years)
+    dividend_df = readLedgerRows(
+        connection, "dividend_transactions", DIVIDEND_NAMING_CONVERSION,
+        DIVIDEND_LEDGER_COLUMNS, "date", years)
+    annual_df = aggregateAnnualData(stock_df, dividend_df).reindex(
+        years, fill_value=0)
+    columns = ", ".join(["year"] + ANNUAL_COLUMNS)
+    placeholders = ", ".join("?" * (len(ANNUAL_COLUMNS) + 1))
+    connection.executemany(
+        f"INSERT OR REPLACE INTO annual_aggregates ({columns}) "
+        f"VALUES ({placeholders})",
+        [(int(year), *map(float, row))
+         for year, row in zip(annual_df.index, annual_df.to_numpy())])
+
+
+def ingest(stock_df, dividend_df, file_name=LEDGER_FILE):
+    stock_rows = toLedgerRows(
+        stock_df, STOCK_NAMING_CONVERSION, STOCK_LEDGER_COLUMNS, "sell_date",
+        STOCK_KEY_COLUMNS)
+    dividend_rows = toLedgerRows(
+        dividend_df, DIVIDEND_NAMING_CONVERSION, DIVIDEND_LEDGER_COLUMNS,
+        "date", DIVIDEND_KEY_COLUMNS)
+    with openLedger(file_name) as connection:
+        checkLedgerVersion(connection, file_name)
+        new_stock_rows, stock_years = insertNewRows(
+            connection, "stock_transactions", stock_rows)
+        new_dividend_rows, dividend_years = insertNewRows(
+            connection, "dividend_transactions", dividend_rows)
+        updated_years = sorted(stock_years | dividend_years)
+        updateAnnualAggregates(connection, updated_years)
+    connection.close()
+    return new_stock_rows, new_dividend_rows, updated_years
+
+
+def readAnnualAggregates(file_name=LEDGER_FILE):
+    with openLedger(file_name) as connection:
+        annual_df = pd.read_sql_query(
+            "SELECT * FROM annual_aggregates ORDER BY year", connection,
+            index_col="year")
+    connection.close()
+    if annual_df.empty:
+        raise ValueError(f"Ledger ({file_name}) has no transactions")
+    return annual_df.reindex(
+        range(annual_df.index.min(), annual_df.index.max() + 1),
+        fill_value=0)[ANNUAL_COLUMNS]
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Merge Nordnet exports into the transaction ledger")
+    parser.add_argument("--ledger", default=LEDGER_FILE)
+    parser.add_argument("--stock-csv", default=STOCK_CSV_FILE)
+    parser.add_argument("--dividend-csv", default=DIVIDEND_CSV_FILE)
+    parser.add_argument("--cache-directory", default=CACHE_DIRECTORY)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    stock_df = readCachedCsv(
+        args.stock_csv, readStockCsv, args.cache_directory)
+    dividend_df = readCachedCsv(
+        args.dividend_csv, readDividendCsv, args.cache_directory)
+    new_stock_rows, new_dividend_rows, updated_years = ingest(
+        stock_df, dividend_df, args.ledger)
+    print("New stock rows:      ", new_stock_rows)
+    print("New transaction rows:", new_dividend_rows)
+    print("Updated years:       ", ", ".join(map(str, updated_years)) or "-")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import argparse
+
+import numpy as np
+
+from annual_aggregates import (
+    DIVIDEND_NAMING_CONVERSION,
+    aggregateAnnualData,
+    taxedIncomes,
+)
+from capital_income_tax_calculator import (
+    DIVIDEND_CSV_FILE,
+    STOCK_CSV_FILE,
+    readDividendCsv,
+    readStockCsv,
+)
+from export_cache import CACHE_DIRECTORY, readCachedCsv
+from table_renderer import TABLE_FORMATS, writeTable
+from tax_engine import taxParameters, totalTaxes
+
+
+# Maximum number of plan-lot pairs evaluated at once
+MAX_CHUNK_ELEMENTS = 1 << 22
+
+# Columns returned by realiseSellPlans(), same names as in printTable
+REALISATION_COLUMNS = ["buy_cost", "sell_cost", "loss", "profit"]
+
+
+def buildOpenLots(securities, dates, quantities, unit_prices, unit_costs):
+    # Lots are stored as flat arrays sorted by security and buy date, the
+    # lots of security i are lots[offsets[i]:offsets[i + 1]]
+    security_names, security_indices = np.unique(
+        np.asarray(securities), return_inverse=True)
+    dates = np.asarray(dates)
+    order = np.lexsort((dates, security_indices))
+    security_indices = security_indices[order]
+    quantities = np.asarray(quantities, dtype=np.float64)[order]
+    offsets = np.searchsorted(
+        security_indices, np.arange(len(security_names) + 1))
+
+    # Quantity owned before each lot within its security
+    cumulative_quantities = np.cumsum(quantities)
+    security_starts = np.concatenate([[0], cumulative_quantities])[
+        offsets[security_indices]]
+    return {
+        "securities": security_names,
+        "security_indices": security_indices,
+        "offsets": offsets,
+        "dates": dates[order],
+        "quantities": quantities,
+        "unit_prices": np.asarray(unit_prices, dtype=np.float64)[order],
+        "unit_costs": np.asarray(unit_costs, dtype=np.float64)[order],
+        "quantities_before": cumulative_quantities - quantities -
+        security_starts,
+    }
+
+
+def takenQuantities(lots, sell_quantities):
+    # FIFO: a sell takes lots in buy date order until the quantity is met
+    quantities_per_lot = sell_quantities[:, lots["security_indices"]]
+    return np.clip(
+        quantities_per_lot - lots["quantities_before"], 0, lots["quantities"])
+
+
+def securityTotals(lots, quantities):
+    # Sum lot values per security, empty securities sum to zero
+    offsets = lots["offsets"]
+    totals = np.zeros((quantities.shape[0], len(offsets) - 1))
+    non_empty = offsets[:-1] < offsets[1:]
+    if quantities.shape[1]:
+        totals[:, non_empty] = np.add.reduceat(
+            quantities, offsets[:-1][non_empty], axis=1)
+    return totals
+
+
+def holdings(lots):
+    return securityTotals(lots, lots["quantities"][None, :])[0]
+
+
+def readOpenLots(dividend_df):
+    dnc = DIVIDEND_NAMING_CONVERSION
+    transaction_types = dividend_df[dnc["transaction_type"]]
+    buys = dividend_df[transaction_types == dnc["buy"]]
+    sells = dividend_df[transaction_types == dnc["sell"]]
+
+    # Buy amounts are negative and include the fees
+    quantities = buys[dnc["quantity"]].to_numpy(np.float64)
+    fees = buys[dnc["fees"]].fillna(0).to_numpy(np.float64)
+    prices = buys[dnc["profit"]].abs().to_numpy(np.float64) - fees
+    lots = buildOpenLots(
+        buys[dnc["security"]].to_numpy(str), buys[dnc["date"]].to_numpy(),
+        quantities, prices / quantities, fees / quantities)
+
+    # Remove the quantities that have already been sold
+    sold = sells.groupby(dnc["security"])[dnc["quantity"]].sum().reindex(
+        lots["securities"], fill_value=0)
+    sold_quantities = sold.to_numpy(np.float64)[None, :]
+    remaining = lots["quantities"] - takenQuantities(lots, sold_quantities)[0]
+    is_open = remaining > 0
+    return buildOpenLots(
+        lots["securities"][lots["security_indices"][is_open]],
+        lots["dates"][is_open], remaining[is_open],
+        lots["unit_prices"][is_open], lots["unit_costs"][is_open])
+
+
+def realiseSellPlans(lots, sell_quantities, sell_prices, sell_costs=0):
+    # Sell quantities are (plans, securities), prices and costs per sale
+    # broadcast to the same shape
+    sell_quantities = np.atleast_2d(np.asarray(sell_quantities, np.float64))
+    shape = sell_quantities.shape
+    sell_prices = np.broadcast_to(sell_prices, shape)
+    sell_costs = np.broadcast_to(sell_costs, shape)
+    if np.any(sell_quantities > holdings(lots) + 1e-9):
+        raise ValueError("Sell quantity must not exceed the open lots")
+
+    results = {column: np.zeros(shape[0]) for column in REALISATION_COLUMNS}
+    chunk_size = max(1, MAX_CHUNK_ELEMENTS // max(1, len(lots["quantities"])))
+    for start in range(0, shape[0], chunk_size):
+        chunk = slice(start, start + chunk_size)
+        taken = takenQuantities(lots, sell_quantities[chunk])
+        acquisition_prices = securityTotals(lots, taken * lots["unit_prices"])
+        buy_costs = securityTotals(lots, taken * lots["unit_costs"])
+        is_sold = sell_quantities[chunk] > 0
+        profits = np.where(
+            is_sold,
+            sell_quantities[chunk] * sell_prices[chunk] - acquisition_prices,
+            0)
+        results["buy_cost"][chunk] = buy_costs.sum(axis=1)
+        results["sell_cost"][chunk] = np.where(
+            is_sold, sell_costs[chunk], 0).sum(axis=1)
+        results["loss"][chunk] = np.maximum(-profits, 0).sum(axis=1)
+        results["profit"][chunk] = np.maximum(profits, 0).sum(axis=1)
+    return results
+
+
+def incrementalTaxes(lots, sell_quantities, sell_prices, sell_costs,
+                     taxed_incomes, years, year_index=-1):
+    # Change in the selected year's total tax for each sell plan
+    realisations = realiseSellPlans(
+        lots, sell_quantities, sell_prices, sell_costs)
+    stock_incomes = (
+        realisations["profit"] - realisations["buy_cost"] -
+        realisations["sell_cost"] - realisations["loss"])
+    parameters = taxParameters(years)
+    base_tax = totalTaxes(taxed_incomes, **parameters)[year_index]
+    incomes = np.tile(
+        np.asarray(taxed_incomes, np.float64), (len(stock_incomes), 1))
+    incomes[:, year_index] += stock_incomes
+    realisations["total_tax"] = \
+        totalTaxes(incomes, **parameters)[:, year_index] - base_tax
+    return realisations
+
+
+def cheapestSellPlans(lots, sell_quantities, sell_prices, sell_costs,
+                      taxed_incomes, years, year_index=-1):
+    # Plan indices ordered by the tax they cause, cheapest first
+    realisations = incrementalTaxes(
+        lots, sell_quantities, sell_prices, sell_costs, taxed_incomes, years,
+        year_index)
+    return np.argsort(realisations["total_tax"], kind="stable"), realisations
+
+
+def parseAmounts(text, option):
+    # "SECURITY=AMOUNT,..." to a dict
+    amounts = {}
+    for item in text.split(","):
+        security, _, amount = item.partition("=")
+        try:
+            amounts[security.strip()] = float(amount)
+        except ValueError:
+            raise ValueError(
+                f"{option}: expected SECURITY=AMOUNT,... ({text})") from None
+    return amounts
+
+
+def sellPlanArrays(lots, plans, prices):
+    # (plans, securities) sell quantities and prices of the plans
+    security_indices = {
+        security: i for i, security in enumerate(lots["securities"])}
+    sell_quantities = np.zeros((len(plans), len(security_indices)))
+    sell_prices = np.zeros(len(security_indices))
+    for i, plan in enumerate(plans):
+        for security, quantity in plan.items():
+            if security not in security_indices:
+                raise ValueError(f"No open lots of {security}")
+            if security not in prices:
+                raise ValueError(f"No --price for {security}")
+            sell_quantities[i, security_indices[security]] = quantity
+            sell_prices[security_indices[security]] = prices[security]
+    return sell_quantities, sell_prices
+
+
+def yearIncomes(annual_df, year):
+    # Taxed incomes of the years until the year, a year without
+    # transactions has none
+    incomes = taxedIncomes(annual_df).reindex(
+        range(annual_df.index.min(), max(year, annual_df.index.max()) + 1),
+        fill_value=0).loc[:year]
+    return incomes.to_numpy(np.float64), incomes.index
+
+
+def printOpenLots(lots, table_format="ascii"):
+    quantities = holdings(lots)
+    costs = securityTotals(
+        lots, (lots["quantities"] * (
+            lots["unit_prices"] + lots["unit_costs"]))[None, :])[0]
+    offsets = lots["offsets"]
+    writeTable(
+        ["#", "Security", "Lots", "Quantity", "Acquisition cost"],
+        [list(range(1, len(quantities) + 1)), list(lots["securities"]),
+         list(np.diff(offsets)), list(quantities), list(costs)],
+        table_format, total_row=False)
+
+
+def printSellPlans(plan_texts, order, realisations, table_format="ascii"):
+    # Cheapest plan first
+    columns = ["buy_cost", "sell_cost", "loss", "profit", "total_tax"]
+    writeTable(
+        ["#", "Buy cost", "Sell cost", "Loss", "Profit", "Added tax",
+         "Plan"],
+        [[int(i) + 1 for i in order]] +
+        [list(realisations[column][order]) for column in columns] +
+        [[plan_texts[i] for i in order]],
+        table_format, total_row=False)
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Print the open lots or the tax of selling them")
+    parser.add_argument("--stock-csv", default=STOCK_CSV_FILE)
+    parser.add_argument("--dividend-csv", default=DIVIDEND_CSV_FILE)
+    parser.add_argument("--cache-directory", default=CACHE_DIRECTORY)
+    parser.add_argument(
+        "--plan", action="append", default=[], metavar="SECURITY=QUANTITY,...",
+        help="Sell plan to compare, can be given many times")
+    parser.add_argument(
+        "--price", action="append", default=[], metavar="SECURITY=PRICE,...",
+        help="Sell price of every security in the plans")
+    parser.add_argument(
+        "--sell-cost", type=float, default=0.0,
+        help="Cost of every sale")
+    parser.add_argument(
+        "--year", type=int,
+        help="Year of the sales, the last year of the exports by default")
+    parser.add_argument(
+        "--format", choices=TABLE_FORMATS, default="ascii",
+        help="Print the table as text or for other programs")
+    args = parser.parse_args(argv)
+    try:
+        args.plans = [parseAmounts(plan, "--plan") for plan in args.plan]
+        args.prices = {}
+        for prices in args.price:
+            args.prices.update(parseAmounts(prices, "--price"))
+    except ValueError as error:
+        parser.error(str(error))
+    return args
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    dividend_df = readCachedCsv(
+        args.dividend_csv, readDividendCsv, args.cache_directory)
+    lots = readOpenLots(dividend_df)
+    if not args.plans:
+        printOpenLots(lots, args.format)
+        return
+
+    stock_df = readCachedCsv(
+        args.stock_csv, readStockCsv, args.cache_directory)
+    annual_df = aggregateAnnualData(stock_df, dividend_df)
+    taxed_incomes, years = yearIncomes(
+        annual_df, args.year or annual_df.index.max())
+    sell_quantities, sell_prices = sellPlanArrays(
+        lots, args.plans, args.prices)
+    order, realisations = cheapestSellPlans(
+        lots, sell_quantities, sell_prices, args.sell_cost, taxed_incomes,
+        years)
+    printSellPlans(args.plan, order, realisations, args.format)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+import copy
+import functools
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+MEMO_SIZE = 32
+
+# Lookups of all memoized functions in this process
+MEMO_STATISTICS = {
+    "hits": 0,
+    "misses": 0,
+}
+
+
+def arrayDigest(array):
+    array = np.ascontiguousarray(array)
+    if array.dtype == object:
+        return hashlib.blake2b(repr(array.tolist()).encode()).hexdigest()
+    return hashlib.blake2b(array.view(np.uint8)).hexdigest()
+
+
+def inputKey(value):
+    # Hashable key of the value's contents, equal arrays and frames give
+    # equal keys whatever object they are. Frames exist only if pandas has
+    # been imported, it is not imported here.
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(value, (pd.DataFrame, pd.Series)):
+        return (
+            type(value).__name__, value.shape,
+            repr(value.dtypes.to_dict() if isinstance(value, pd.DataFrame)
+                 else value.dtype),
+            inputKey(value.index.to_numpy()),
+            inputKey(value.columns.to_numpy())
+            if isinstance(value, pd.DataFrame) else value.name,
+            arrayDigest(pd.util.hash_pandas_object(value, index=False)))
+    if isinstance(value, np.ndarray):
+        return "ndarray", value.dtype.str, value.shape, arrayDigest(value)
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return "dict", tuple(
+            (key, inputKey(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return type(value).__name__, tuple(inputKey(item) for item in value)
+    hash(value)
+    return value
+
+
+def isCopyOnWrite(pd):
+    # Always on from pandas 3, optional before it
+    return int(pd.__version__.split(".")[0]) >= 3 or \
+        pd.options.mode.copy_on_write is True
+
+
+def sharedResult(value):
+    # Result that can be given to every caller without copying the data:
+    # read-only views of arrays in new dicts, lists and tuples. Frames are
+    # shallow copies when pandas copies on write, otherwise deep copies.
+    if isinstance(value, np.ndarray):
+        view = value.view()
+        view.setflags(write=False)
+        return view
+    pd = sys.modules.get("pandas")
+    if pd is not None and isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy(deep=not isCopyOnWrite(pd))
+    if isinstance(value, dict):
+        return {key: sharedResult(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return type(value)(sharedResult(item) for item in value)
+    return copy.deepcopy(value)
+
+
+def memoized(maxsize=MEMO_SIZE):
+    # Least recently used cache of results keyed on the argument values.
+    # Hits cost no copy of the data: arrays of results are read-only, so a
+    # caller that changes one has to copy it first, and changing a frame
+    # leaves the cached one as it was. The cache is locked, results are
+    # computed outside the lock.
+    def decorator(function):
+        cache = OrderedDict()
+        lock = threading.Lock()
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            key = inputKey((args, tuple(sorted(kwargs.items()))))
+            with lock:
+                if key in cache:
+                    cache.move_to_end(key)
+                    MEMO_STATISTICS["hits"] += 1
+                    return sharedResult(cache[key])
+                MEMO_STATISTICS["misses"] += 1
+            result = sharedResult(function(*args, **kwargs))
+            with lock:
+                cache[key] = result
+                if len(cache) > maxsize:
+                    cache.popitem(last=False)
+            return sharedResult(result)
+
+        wrapper.cache = cache
+        wrapper.cache_clear = cache.clear
+        return wrapper
+
+    return decorator
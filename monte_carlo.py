@@ -0,0 +1,234 @@
+import argparse
+
+import numpy as np
+
+from projection import (
+    MONTHS_IN_YEAR,
+    TARGET_EQUITY,
+    firstCrossingMonths,
+    monthlySavings,
+)
+
+
+PERCENTILES = [5, 50, 95]
+ANNUAL_VOLATILITY_PERCENT = 20
+MEMORY_BUDGET_MB = 256
+
+# Equity bins used to estimate percentiles without keeping paths. Bins are
+# even in asinh(equity): about 0.6 % wide relative to large positive or
+# negative equities and under a euro wide near zero.
+HISTOGRAM_LIMIT = 1e10
+HISTOGRAM_BINS = 8192
+
+# Paths drawn from one generator, the seed alone decides the paths whatever
+# the memory budget
+PATHS_PER_BLOCK = 256
+
+
+def lognormalSampler(annual_return_percent,
+                     annual_volatility_percent=ANNUAL_VOLATILITY_PERCENT):
+    # Monthly growth factors whose mean matches the expected annual return
+    sigma = annual_volatility_percent / 100 / np.sqrt(MONTHS_IN_YEAR)
+    mu = np.log(1 + annual_return_percent / 100) / MONTHS_IN_YEAR - \
+        sigma ** 2 / 2
+
+    def sample(rng, shape):
+        return np.exp(rng.normal(mu, sigma, shape))
+    return sample
+
+
+def historicalMonthlyReturns(date_values):
+    # Stock profit change relative to equity between snapshots, scaled to
+    # an average month
+    dates = np.asarray(date_values["dates_as_numbers"], dtype=float)
+    equities = np.asarray(date_values["equities"], dtype=float)
+    stock_profits = np.asarray(date_values["stock_profits"], dtype=float)
+    days = np.diff(dates)
+    is_valid = (days > 0) & (equities[:-1] > 0)
+    returns = np.diff(stock_profits)[is_valid] / equities[:-1][is_valid]
+    month_length = 365.25 / MONTHS_IN_YEAR
+    return (1 + returns) ** (month_length / days[is_valid])
+
+
+def bootstrapSampler(monthly_growth_factors):
+    monthly_growth_factors = np.asarray(monthly_growth_factors, dtype=float)
+    if len(monthly_growth_factors) == 0:
+        raise ValueError("History must contain at least two snapshots")
+
+    def sample(rng, shape):
+        return rng.choice(monthly_growth_factors, size=shape)
+    return sample
+
+
+def simulatePaths(growth_factors, start_equity, savings):
+    # E_m = G_m * (E_0 + sum_{k <= m} s_k / G_k), G cumulative growth
+    cumulative_growth = np.cumprod(growth_factors, axis=-1)
+    equities = cumulative_growth * (
+        start_equity + np.cumsum(savings / cumulative_growth, axis=-1))
+    return np.concatenate(
+        [np.full((len(equities), 1), float(start_equity)), equities], axis=-1)
+
+
+def chunkSize(n_months, memory_budget_mb=MEMORY_BUDGET_MB):
+    # Paths in whole blocks, at least one block. Growth factors, cumulative
+    # growth, equities, bin indices and the temporaries of the NumPy
+    # operations between them.
+    bytes_per_path = 8 * 8 * (n_months + 1)
+    paths = int(memory_budget_mb * 2 ** 20 // bytes_per_path)
+    return max(1, paths // PATHS_PER_BLOCK) * PATHS_PER_BLOCK
+
+
+def histogramBins(equities):
+    # Bin of every equity, equities beyond the limits go to the first or
+    # last bin
+    limit = np.arcsinh(HISTOGRAM_LIMIT)
+    bins = (np.arcsinh(equities) + limit) * (HISTOGRAM_BINS / (2 * limit))
+    return np.clip(bins, 0, HISTOGRAM_BINS - 1).astype(np.int64)
+
+
+def histogramEdges():
+    return np.linspace(
+        -np.arcsinh(HISTOGRAM_LIMIT), np.arcsinh(HISTOGRAM_LIMIT),
+        HISTOGRAM_BINS + 1)
+
+
+def histogramPercentiles(counts, percentiles):
+    # Interpolate inside the bin, in asinh space, where the percentile falls
+    cumulative_counts = np.cumsum(counts, axis=-1)
+    n_paths = cumulative_counts[..., -1:]
+    asinh_edges = histogramEdges()
+    results = {}
+    for percentile in percentiles:
+        rank = percentile / 100 * n_paths
+        bins = np.minimum(
+            (cumulative_counts < rank).sum(axis=-1), counts.shape[-1] - 1)
+        below = np.take_along_axis(
+            np.concatenate(
+                [np.zeros_like(n_paths), cumulative_counts], axis=-1),
+            bins[..., None], axis=-1)[..., 0]
+        in_bin = np.maximum(counts[np.arange(len(bins)), bins], 1)
+        fraction = np.clip((rank[..., 0] - below) / in_bin, 0, 1)
+        results[percentile] = np.sinh(
+            asinh_edges[bins] +
+            fraction * (asinh_edges[bins + 1] - asinh_edges[bins]))
+    return results
+
+
+def simulate(start_equity, monthly_savings, savings_increase_percent, years,
+             sampler, n_paths, target=TARGET_EQUITY, seed=0,
+             memory_budget_mb=MEMORY_BUDGET_MB, percentiles=PERCENTILES):
+    n_months = years * MONTHS_IN_YEAR
+    savings = monthlySavings(monthly_savings, savings_increase_percent, years)
+    counts = np.zeros((n_months + 1, HISTOGRAM_BINS), dtype=np.int64)
+    crossing_months = np.zeros(n_months + 2, dtype=np.int64)
+
+    # Every block of paths gets its own generator, a run is reproducible for
+    # a given seed. Chunks of whole blocks are simulated at once.
+    chunk_size = chunkSize(n_months, memory_budget_mb)
+    n_blocks = -(-n_paths // PATHS_PER_BLOCK)
+    seed_sequences = np.random.SeedSequence(seed).spawn(n_blocks)
+    month_offsets = np.arange(n_months + 1) * HISTOGRAM_BINS
+    for chunk_start in range(0, n_paths, chunk_size):
+        chunk_end = min(chunk_start + chunk_size, n_paths)
+        growth_factors = np.concatenate([
+            sampler(
+                np.random.default_rng(seed_sequences[
+                    block_start // PATHS_PER_BLOCK]),
+                (min(PATHS_PER_BLOCK, chunk_end - block_start), n_months))
+            for block_start in range(
+                chunk_start, chunk_end, PATHS_PER_BLOCK)])
+        equities = simulatePaths(growth_factors, start_equity, savings)
+        del growth_factors
+
+        bins = histogramBins(equities)
+        counts += np.bincount(
+            (bins + month_offsets).ravel(),
+            minlength=counts.size).reshape(counts.shape)
+        months = firstCrossingMonths(equities, target, is_monotonic=False)
+        crossing_months += np.bincount(
+            np.where(months < 0, n_months + 1, months),
+            minlength=n_months + 2)
+
+    # Every path starts from the start equity, month 0 needs no estimate
+    year_months = np.arange(years + 1) * MONTHS_IN_YEAR
+    reached_by_month = np.cumsum(crossing_months[:-1]) / n_paths
+    equity_percentiles = histogramPercentiles(counts, percentiles)
+    for values in equity_percentiles.values():
+        values[0] = start_equity
+    return {
+        "months": np.arange(n_months + 1),
+        "percentiles": equity_percentiles,
+        "probability_by_year": reached_by_month[year_months],
+    }
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Simulate equity paths with random returns")
+    parser.add_argument("start_equity", type=float)
+    parser.add_argument("monthly_savings", type=float)
+    parser.add_argument("--savings-increase", type=float, default=7)
+    parser.add_argument("--return", dest="annual_return", type=float,
+                        default=7)
+    parser.add_argument("--volatility", type=float,
+                        default=ANNUAL_VOLATILITY_PERCENT)
+    parser.add_argument(
+        "--bootstrap", metavar="CSV",
+        help="Resample monthly returns from a wealth history, e.g. "
+        "omaisuus.csv")
+    parser.add_argument("--years", type=int, default=20)
+    parser.add_argument("--paths", type=int, default=10000)
+    parser.add_argument("--target", type=float, default=TARGET_EQUITY)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--memory-mb", type=float, default=MEMORY_BUDGET_MB)
+    parser.add_argument("--no-plot", action="store_true")
+    return parser.parse_args(argv)
+
+
+def plotPercentileBands(result, title):
+    # Imported here so the simulation can be used without matplotlib
+    import matplotlib.pyplot as plt
+    from matplotlib.ticker import FuncFormatter
+
+    years = result["months"] / MONTHS_IN_YEAR
+    percentiles = result["percentiles"]
+    plt.fill_between(
+        years, percentiles[PERCENTILES[0]], percentiles[PERCENTILES[-1]],
+        alpha=0.3, label=f"P{PERCENTILES[0]}-P{PERCENTILES[-1]}")
+    plt.plot(years, percentiles[50], label="P50")
+    plt.gca().yaxis.set_major_formatter(
+        FuncFormatter(lambda value, _: f"{value:,.0f}"))
+    plt.legend()
+    plt.xlabel("Years")
+    plt.ylabel("Euros (€)")
+    plt.title(title)
+    plt.show()
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    if args.bootstrap:
+        from plot_wealth_chart import DELIMITER, readWealthData
+        date_values, _ = readWealthData(args.bootstrap, DELIMITER)
+        sampler = bootstrapSampler(historicalMonthlyReturns(date_values))
+    else:
+        sampler = lognormalSampler(args.annual_return, args.volatility)
+    result = simulate(
+        args.start_equity, args.monthly_savings, args.savings_increase,
+        args.years, sampler, args.paths, args.target, args.seed,
+        args.memory_mb)
+
+    print("Year |" + "".join(f"{f'P{p}':>14} |" for p in PERCENTILES) +
+          " P(target)")
+    for year in range(args.years + 1):
+        month = year * MONTHS_IN_YEAR
+        print(f"{year:>4} |" + "".join(
+            f"{result['percentiles'][p][month]:>14,.0f} |"
+            for p in PERCENTILES) +
+            f" {100 * result['probability_by_year'][year]:>8.1f} %")
+    if not args.no_plot:
+        plotPercentileBands(result, "Simulated financial progress")
+
+
+if __name__ == "__main__":
+    main()
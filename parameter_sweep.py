@@ -0,0 +1,136 @@
+import argparse
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from math import ceil, sqrt
+
+import numpy as np
+
+from projection import MONTHS_IN_YEAR, TARGET_EQUITY, monthsToTarget
+
+
+GRID_FILE = "sweep.npz"
+CHUNK_SIZE = 20000
+MAX_HEATMAPS = 9
+
+# Swept parameters in the order of the grid axes
+AXES = ["monthly_savings", "savings_increase_percent", "annual_return_percent"]
+
+
+def parseGridSpec(spec):
+    # "start:stop:step" with stop included, or comma separated values
+    if ":" in spec:
+        start, stop, step = [float(value) for value in spec.split(":")]
+        return np.arange(start, stop + step / 2, step)
+    return np.array([float(value) for value in spec.split(",")])
+
+
+def evaluateChunk(start, stop, axes, start_equity, years, target):
+    shape = tuple(len(axis) for axis in axes)
+    indices = np.unravel_index(np.arange(start, stop), shape)
+    parameters = [axis[index] for axis, index in zip(axes, indices)]
+    months = monthsToTarget(start_equity, *parameters, years, target)
+    return start, months.astype(np.int16)
+
+
+def runSweep(axes, start_equity, years, target=TARGET_EQUITY,
+             chunk_size=CHUNK_SIZE, workers=None, progress=True):
+    shape = tuple(len(axis) for axis in axes)
+    n_cells = int(np.prod(shape))
+    months = np.empty(n_cells, dtype=np.int16)
+    evaluated = 0
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(
+                evaluateChunk, start, min(start + chunk_size, n_cells), axes,
+                start_equity, years, target)
+            for start in range(0, n_cells, chunk_size)]
+        for future in as_completed(futures):
+            start, chunk_months = future.result()
+            months[start:start + len(chunk_months)] = chunk_months
+            evaluated += len(chunk_months)
+            if progress:
+                print("\rEvaluated {:,} / {:,} cells ({:.0f} %)".format(
+                    evaluated, n_cells, 100 * evaluated / n_cells),
+                    end="", file=sys.stderr)
+    if progress:
+        print(file=sys.stderr)
+    return months.reshape(shape)
+
+
+def saveGrid(file_name, axes, months, start_equity, years, target):
+    np.savez_compressed(
+        file_name, months=months, start_equity=start_equity, years=years,
+        target=target, **dict(zip(AXES, axes)))
+
+
+def loadGrid(file_name):
+    with np.load(file_name) as grid:
+        return {key: grid[key] for key in grid.files}
+
+
+def plotHeatmaps(grid, file_name):
+    # Imported here so the pool workers do not need to load matplotlib
+    import matplotlib.pyplot as plt
+
+    # One heatmap of savings and return per savings increase value
+    years_to_target = np.ma.masked_less(grid["months"], 0) / MONTHS_IN_YEAR
+    increases = grid[AXES[1]]
+    indices = np.unique(np.linspace(
+        0, len(increases) - 1, min(len(increases), MAX_HEATMAPS)).astype(int))
+    grid_x = int(sqrt(len(indices)))
+    grid_y = ceil(len(indices) / grid_x)
+    fig = plt.figure(figsize=(5 * grid_y, 4 * grid_x))
+    for i, index in enumerate(indices):
+        ax = fig.add_subplot(grid_x, grid_y, i + 1)
+        image = ax.pcolormesh(
+            grid[AXES[0]], grid[AXES[2]], years_to_target[:, index, :].T,
+            shading="nearest", cmap="viridis_r")
+        fig.colorbar(image, ax=ax, label="Years to target")
+        ax.set_xlabel("Monthly savings (€)")
+        ax.set_ylabel("Annual return (%)")
+        ax.set_title(f"Savings increase {increases[index]:g} %")
+    fig.suptitle("Years to {:,.0f} €".format(float(grid["target"])))
+    fig.tight_layout()
+    fig.savefig(file_name)
+    plt.close(fig)
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Evaluate years to target over a grid of parameters")
+    parser.add_argument("start_equity", type=float)
+    parser.add_argument(
+        "--savings", required=True, help="Monthly savings, e.g. 500:3000:50")
+    parser.add_argument(
+        "--increase", default="7", help="Annual savings increase in percent")
+    parser.add_argument(
+        "--return", dest="annual_return", required=True,
+        help="Annual return in percent, e.g. 0:20:0.5")
+    parser.add_argument("--years", type=int, default=40)
+    parser.add_argument("--target", type=float, default=TARGET_EQUITY)
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--output", default=GRID_FILE)
+    parser.add_argument("--heatmap", help="Image file for the heatmaps")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    axes = [
+        parseGridSpec(args.savings),
+        parseGridSpec(args.increase),
+        parseGridSpec(args.annual_return),
+    ]
+    months = runSweep(
+        axes, args.start_equity, args.years, args.target, args.chunk_size,
+        args.workers)
+    saveGrid(
+        args.output, axes, months, args.start_equity, args.years, args.target)
+    if args.heatmap:
+        plotHeatmaps(loadGrid(args.output), args.heatmap)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+import argparse
+import hashlib
+import os
+
+import numpy as np
+
+from atomic_write import writeAtomically
+
+
+# Wealth history read by default, plot_wealth_chart.py and the other
+# scripts use this one
+CSV_FILE_NAME = "omaisuus.csv"
+DELIMITER = ","
+
+# Months in every period, periods start on January, April, July and October
+# for quarters
+PERIOD_MONTHS = {
+    "year": 12,
+    "quarter": 3,
+    "month": 1,
+}
+VALUE_KEYS = ["savings", "stock_profits", "equities"]
+
+# Increase when the cached arrays change so old caches are rebuilt
+PERIOD_CACHE_VERSION = 1
+
+
+def dayNumbers(dates):
+    # Matplotlib date numbers, days since its default epoch 1970-01-01
+    return (np.asarray(dates, "datetime64[D]") -
+            np.datetime64("1970-01-01", "D")).astype(np.float64)
+
+
+def datesToNumbers(days, months, years):
+    # Matplotlib date numbers straight from the date parts
+    dates = (
+        (years - 1970).astype("datetime64[Y]").astype("datetime64[M]") +
+        (months - 1).astype("timedelta64[M]")).astype("datetime64[D]") + \
+        (days - 1).astype("timedelta64[D]")
+    return dayNumbers(dates)
+
+
+def dateValues(days, months, years, savings, stock_profits):
+    return {
+        "savings": savings,
+        "stock_profits": stock_profits,
+        "equities": savings + stock_profits,
+        "dates_as_numbers": datesToNumbers(days, months, years),
+    }
+
+
+def periodStarts(months, years, period):
+    # Months since January 1970 of the first month of every snapshot's period
+    period_months = PERIOD_MONTHS[period]
+    return (years - 1970) * 12 + (months - 1) // period_months * period_months
+
+
+def periodEndNumbers(period_starts, period):
+    # Last day of the period is the day before the next period starts
+    next_starts = (period_starts + PERIOD_MONTHS[period]).astype(
+        "datetime64[M]").astype("datetime64[D]")
+    return dayNumbers(next_starts) - 1
+
+
+def periodValues(date_values, period_starts, period):
+    # Interpolate values on the period's last day between the last snapshot
+    # of the period and the first one of the next, the last period ends to
+    # the last snapshot
+    dates_as_numbers = date_values["dates_as_numbers"]
+    ended_periods = period_starts[
+        np.flatnonzero(period_starts[1:] > period_starts[:-1])]
+    period_ends = periodEndNumbers(ended_periods, period)
+    values = {
+        "period_starts": np.append(ended_periods, period_starts[-1]),
+        "dates_as_numbers": np.append(period_ends, dates_as_numbers[-1]),
+    }
+    for key in VALUE_KEYS:
+        values[key] = np.append(
+            np.interp(period_ends, dates_as_numbers, date_values[key]),
+            date_values[key][-1])
+    return values
+
+
+def yearValues(period_values):
+    return {
+        "years": 1970 + period_values["period_starts"] // 12,
+        **{key: period_values[key] for key in VALUE_KEYS},
+    }
+
+
+def wealthValues(days, months, years, savings, stock_profits):
+    # Snapshots in date order
+    date_values = dateValues(days, months, years, savings, stock_profits)
+    return date_values, yearValues(periodValues(
+        date_values, periodStarts(months, years, "year"), "year"))
+
+
+def absoluteGrowth(values):
+    return np.diff(np.asarray(values, dtype=float))
+
+
+def percentageGrowth(values, base_values=None):
+    # Change from the previous period relative to the previous value, or to
+    # the previous value of another series
+    values = np.asarray(values, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if base_values is None:
+            return 100 * (values[1:] / values[:-1] - 1)
+        return 100 * np.diff(values) / np.asarray(
+            base_values, dtype=float)[:-1]
+
+
+def percentageYearlyGrowth(year_values, skip_keys, equity_comparison_keys=[]):
+    percentage_yearly_growth = {}
+
+    # Growth compared to last year value
+    for key in year_values.keys():
+        if key in skip_keys:
+            continue
+        percentage_yearly_growth[key] = percentageGrowth(year_values[key])
+
+    # Growth compared to last year equity
+    for key in equity_comparison_keys:
+        percentage_yearly_growth[key + "_per_equity"] = percentageGrowth(
+            year_values[key], year_values["equities"])
+    percentage_yearly_growth["years"] = year_values["years"][1:].copy()
+    return percentage_yearly_growth
+
+
+def absoluteYearlyGrowth(year_values, skip_keys):
+    absolute_yearly_growth = {}
+    for key in year_values.keys():
+        if key in skip_keys:
+            continue
+        absolute_yearly_growth[key] = absoluteGrowth(year_values[key])
+    absolute_yearly_growth["years"] = year_values["years"][1:].copy()
+    return absolute_yearly_growth
+
+
+def readSnapshotColumns(file_name, delimiter=DELIMITER):
+    # day, month, year, savings and stock_profits arrays of omaisuus.csv
+    # style files or snapshot stores
+    from snapshot_store import isSnapshotStore, readSnapshots
+    if isSnapshotStore(file_name):
+        return readSnapshots(file_name)
+    data = np.loadtxt(
+        file_name, delimiter=delimiter, skiprows=1, dtype=np.int64, ndmin=2)
+    return tuple(data.T)
+
+
+def snapshotsHash(snapshots, n_snapshots):
+    sha256 = hashlib.sha256()
+    for column in snapshots:
+        sha256.update(np.ascontiguousarray(
+            column[:n_snapshots], dtype=np.float64).tobytes())
+    return sha256.hexdigest()
+
+
+def periodCacheFile(file_name):
+    return f"{file_name}.periods.npz"
+
+
+def readPeriodCache(cache_file):
+    if not os.path.exists(cache_file):
+        return None
+    with np.load(cache_file) as cache:
+        if int(cache["version"]) != PERIOD_CACHE_VERSION:
+            return None
+        return {
+            "n_snapshots": int(cache["n_snapshots"]),
+            "snapshots_hash": str(cache["snapshots_hash"]),
+            "periods": {
+                period: {
+                    key: cache[f"{period}_{key}"]
+                    for key in ["period_starts", "dates_as_numbers"] +
+                    VALUE_KEYS}
+                for period in PERIOD_MONTHS},
+        }
+
+
+def writePeriodCache(cache_file, cache):
+    arrays = {
+        "version": PERIOD_CACHE_VERSION,
+        "n_snapshots": cache["n_snapshots"],
+        "snapshots_hash": cache["snapshots_hash"],
+    }
+    for period, values in cache["periods"].items():
+        for key, value in values.items():
+            arrays[f"{period}_{key}"] = value
+
+    def write(path):
+        with open(path, "wb") as file:
+            np.savez(file, **arrays)
+
+    writeAtomically(cache_file, write)
+
+
+def updatePeriodAggregates(cache, snapshots):
+    # When snapshots were only appended, periods before the one of the
+    # previously last snapshot stay the same and only the rest are computed
+    days, months, years, savings, stock_profits = snapshots
+    n_snapshots = len(days)
+    is_appended = (
+        cache is not None and cache["n_snapshots"] <= n_snapshots and
+        snapshotsHash(snapshots, cache["n_snapshots"]) ==
+        cache["snapshots_hash"])
+    if is_appended and cache["n_snapshots"] == n_snapshots:
+        return cache
+    date_values = dateValues(*snapshots)
+    periods = {}
+    for period in PERIOD_MONTHS:
+        period_starts = periodStarts(months, years, period)
+        if not is_appended:
+            periods[period] = periodValues(date_values, period_starts, period)
+            continue
+        cached_values = cache["periods"][period]
+        first_changed = np.searchsorted(
+            period_starts, cached_values["period_starts"][-1])
+        new_values = periodValues(
+            {key: values[first_changed:]
+             for key, values in date_values.items()},
+            period_starts[first_changed:], period)
+        periods[period] = {
+            key: np.concatenate([cached_values[key][:-1], new_values[key]])
+            for key in new_values}
+    return {
+        "n_snapshots": n_snapshots,
+        "snapshots_hash": snapshotsHash(snapshots, n_snapshots),
+        "periods": periods,
+    }
+
+
+def readPeriodAggregates(file_name, snapshots=None, delimiter=DELIMITER):
+    # Year, quarter and month end values of a wealth history, cached next to
+    # it
+    if snapshots is None:
+        snapshots = readSnapshotColumns(file_name, delimiter)
+    cache_file = periodCacheFile(file_name)
+    cache = readPeriodCache(cache_file)
+    updated_cache = updatePeriodAggregates(cache, snapshots)
+    if updated_cache is not cache:
+        # Reading the history only needs read access, e.g. a read-only
+        # directory is read without a cache
+        try:
+            writePeriodCache(cache_file, updated_cache)
+        except OSError:
+            pass
+    return updated_cache["periods"]
+
+
+def periodLabels(period_starts, period):
+    years = 1970 + period_starts // 12
+    numbers = period_starts % 12 // PERIOD_MONTHS[period] + 1
+    if period == "year":
+        return [str(year) for year in years]
+    if period == "quarter":
+        return [f"{year}Q{number}" for year, number in zip(years, numbers)]
+    return [f"{year}-{number:02d}" for year, number in zip(years, numbers)]
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Print period end values of a wealth history")
+    parser.add_argument("file_name", nargs="?", default=CSV_FILE_NAME)
+    parser.add_argument("--delimiter", default=DELIMITER)
+    parser.add_argument(
+        "--period", choices=PERIOD_MONTHS, default="year")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    values = readPeriodAggregates(
+        args.file_name, delimiter=args.delimiter)[args.period]
+    equity_growth = np.append(np.nan, percentageGrowth(values["equities"]))
+    print("{:<8} {:>12} {:>14} {:>12} {:>10}".format(
+        "Period", "Savings", "Stock profits", "Equity", "Change %"))
+    for label, saving, stock_profit, equity, growth in zip(
+            periodLabels(values["period_starts"], args.period),
+            values["savings"], values["stock_profits"], values["equities"],
+            equity_growth):
+        print("{:<8} {:>12,.0f} {:>14,.0f} {:>12,.0f} {:>10}".format(
+            label, saving, stock_profit, equity,
+            "-" if np.isnan(growth) else f"{growth:.2f}"))
+
+
+if __name__ == "__main__":
+    main()
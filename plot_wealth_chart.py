@@ -1,4 +1,3 @@
-import csv
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
@@ -7,9 +6,21 @@ import sys
 from math import sqrt, ceil
 from textwrap import wrap
 
-
-# CSV file name and delimiter in CSV file
-CSV_FILE_NAME = "omaisuus.csv"
+from calculations import cumulativeValues, growthForecast, yearlyGrowth
+from downsampling import plotDecimated
+from growth_fit import YEARS_PREDICTION
+from period_aggregates import (
+    CSV_FILE_NAME,
+    dateValues,
+    readPeriodAggregates,
+    readSnapshotColumns,
+    wealthValues,
+    yearValues,
+)
+from profiling import popProfileArguments, printProfile, stage
+
+
+# Delimiter in CSV file, the file name is in period_aggregates.py
 DELIMITER = ','
 
 # Date format e.g. 31.12.2019 or 12/31/2019
@@ -17,65 +28,23 @@ DELIMITER = ','
 DATE_FORMAT = "%Y"
 LOCATOR = mdates.YearLocator
 
-YEARS_PREDICTION = 3
-
 
 def formatThousandsTickLabels(ax):
     ax.yaxis.set_major_formatter(FuncFormatter(lambda value, _: f"{value:,.0f}"))
 
 
 def readCsvData(file_name, delimiter):
-    date_values = {
-        "savings": [],
-        "stock_profits": [],
-        "equities": [],
-        "dates_as_numbers": [],
-    }
-    year_values = {
-        "savings": [],
-        "stock_profits": [],
-        "equities": [],
-        "years": [],
-    }
-    previous_year = None
-    with open(file_name, 'r') as csv_file:
-        line_reader = csv.reader(csv_file, delimiter=delimiter)
-        for i, line in enumerate(line_reader):
-            if i == 0:
-                continue
-            [day, month, year, saving, stock_profit] = [int(l) for l in line]
-            date = "{}/{}/{}".format(month, day, year)
-            date_as_number = mdates.datestr2num(date)
-
-            # Store values
-            date_values["savings"].append(saving)
-            date_values["stock_profits"].append(stock_profit)
-            date_values["equities"].append(saving + stock_profit)
-            date_values["dates_as_numbers"].append(date_as_number)
-
-            # Interpolate values on year's last day 31st of Dec
-            if previous_year is not None and year > previous_year:
-                year_values["years"].append(previous_year)
-
-                # Take x-axis values (dates)
-                x0 = date_values["dates_as_numbers"][-2]
-                x2 = date_as_number
-                x1 = mdates.datestr2num(f"31/12/{previous_year}")
-
-                # Interpolate y-axis values (weighted average)
-                for key in date_values.keys():
-                    if key == "dates_as_numbers":
-                        continue
-                    y0 = date_values[key][-2]
-                    y2 = date_values[key][-1]
-                    y1 = y0 + (y2 - y0) * (x1 - x0) / (x2 - x0)
-                    year_values[key].append(y1)
-            previous_year = year
-        year_values["savings"].append(saving)
-        year_values["stock_profits"].append(stock_profit)
-        year_values["equities"].append(saving + stock_profit)
-        year_values["years"].append(year)
-    return date_values, year_values
+    data = np.loadtxt(
+        file_name, delimiter=delimiter, skiprows=1, dtype=np.int64, ndmin=2)
+    return wealthValues(*data.T)
+
+
+def readWealthData(file_name, delimiter=DELIMITER):
+    # Snapshot stores written by equity.py or omaisuus.csv style files, year
+    # values come from the period cache next to the file
+    snapshots = readSnapshotColumns(file_name, delimiter)
+    return dateValues(*snapshots), yearValues(
+        readPeriodAggregates(file_name, snapshots)["year"])
 
 
 def plotDataPerDay(
@@ -84,8 +53,10 @@ def plotDataPerDay(
     ax = plt.gca()
     ax.xaxis.set_major_formatter(mdates.DateFormatter(DATE_FORMAT))
     ax.xaxis.set_major_locator(LOCATOR())
+    # Long histories are drawn with about as many points as the axes has
+    # pixels, zooming draws the visible range in more detail
     for data, label in zip(datas, labels):
-        plt.plot(dates_as_numbers, data, line_style, label=label)
+        plotDecimated(ax, dates_as_numbers, data, line_style, label=label)
     plt.legend()
     plt.grid(axis='y')
     plt.gcf().autofmt_xdate()
@@ -97,53 +68,19 @@ def plotDataPerDay(
         plt.show()
 
 
-def readCommandLineArguments():
+def readCommandLineArguments(argv=None):
+    if argv is None:
+        argv = sys.argv[1:]
+    argv = popProfileArguments(argv)
     csv_file_name = CSV_FILE_NAME
     delimiter = DELIMITER
-    if len(sys.argv) > 1:
-        csv_file_name = sys.argv[1]
-    if len(sys.argv) > 2:
-        delimiter = sys.argv[2]
+    if len(argv) > 0:
+        csv_file_name = argv[0]
+    if len(argv) > 1:
+        delimiter = argv[1]
     return csv_file_name, delimiter
 
 
-def percentageYearlyGrowth(year_values, skip_keys, equity_comparison_keys=[]):
-    percentage_yearly_growth = {}
-
-    # Growth compared to last year value
-    for key in year_values.keys():
-        if key in skip_keys:
-            continue
-        growths = []
-        for i in range(1, len(year_values[key])):
-            growths.append(
-                100 * (year_values[key][i] / year_values[key][i-1] - 1))
-        percentage_yearly_growth[key] = growths
-
-    # Growth compared to last year equity
-    for key in equity_comparison_keys:
-        growths = []
-        for i in range(1, len(year_values[key])):
-            growth = 100 * (year_values[key][i] - year_values[key][i-1]) / year_values["equities"][i-1]
-            growths.append(growth)
-        percentage_yearly_growth[key + "_per_equity"] = growths
-    percentage_yearly_growth["years"] = year_values["years"][1:].copy()
-    return percentage_yearly_growth
-
-
-def absoluteYearlyGrowth(year_values, skip_keys):
-    absolute_yearly_growth = {}
-    for key in year_values.keys():
-        if key in skip_keys:
-            continue
-        growths = []
-        for i in range(1, len(year_values[key])):
-            growths.append(year_values[key][i] - year_values[key][i-1])
-        absolute_yearly_growth[key] = growths
-    absolute_yearly_growth["years"] = year_values["years"][1:].copy()
-    return absolute_yearly_growth
-
-
 def getRedGreenColorMap(data):
     color_map = []
     for value in data:
@@ -165,8 +102,8 @@ def plotBarChart(x, y, title, show=True):
 
 def plot2Datasets(x, data_1, data_2, title, ylabel_1, ylabel_2,
                   data_name_1, data_name_2, values_can_be_negative=True,
-                  bar_width=0.3):
-    fig = plt.figure()
+                  bar_width=0.3, show=True):
+    fig = plt.gcf()
     ax_1 = fig.add_subplot(111)
 
     color = "tab:orange"
@@ -184,37 +121,37 @@ def plot2Datasets(x, data_1, data_2, title, ylabel_1, ylabel_2,
     ax_1.set_xlabel("Year")
     plt.title(title)
     formatThousandsTickLabels(ax_1)
-    plt.show()
+    if show:
+        plt.show()
 
 
 def wrapText(text, max_width=30):
     return "\n".join(wrap(text, max_width))
 
 
-def plotTable(year_values, date_values):
-    table_data = []
-    previous_equity = 0
-    previous_saving = 0
-    previous_stock_profit = 0
-    number_of_years = len(year_values["years"])
-    for i in range(number_of_years):
-        months_a_year = mdates.num2date(date_values["dates_as_numbers"][-1]).month if i == number_of_years - 1 else 12
-        equity = int(year_values["equities"][i])
-        saving = int(year_values["savings"][i])
-        stock_profit = int(year_values["stock_profits"][i])
-        table_data.append([
-            year_values["years"][i],
-            "{:,.0f}".format(equity),
-            "-" if previous_equity == 0 else "{:.2f} %".format(100 * (equity / previous_equity - 1)),
-            "{:,.0f}".format(saving),
-            "{:,.0f}".format((saving - previous_saving) / months_a_year),
-            "-" if previous_saving == 0 else "{:.2f} %".format(100 * (saving / previous_saving - 1)),
-            "{:,.0f}".format(stock_profit),
-            "-" if previous_stock_profit <= 0 else "{:.2f} %".format(100 * (stock_profit / previous_stock_profit - 1)),
-        ])
-        previous_equity = equity
-        previous_saving = saving
-        previous_stock_profit = stock_profit
+def changeTexts(changes):
+    return ["-" if np.isnan(change) else "{:.2f} %".format(change)
+            for change in changes]
+
+
+def plotTable(year_values, date_values, show=True):
+    values = cumulativeValues(year_values, mdates.num2date(
+        date_values["dates_as_numbers"][-1]).month)
+    equity_changes = changeTexts(values["equity_changes"])
+    saving_changes = changeTexts(values["saving_changes"])
+    stock_profit_changes = changeTexts(values["stock_profit_changes"])
+    table_data = [
+        [
+            values["years"][i],
+            "{:,.0f}".format(values["equities"][i]),
+            equity_changes[i],
+            "{:,.0f}".format(values["savings"][i]),
+            "{:,.0f}".format(values["monthly_savings"][i]),
+            saving_changes[i],
+            "{:,.0f}".format(values["stock_profits"][i]),
+            stock_profit_changes[i],
+        ]
+        for i in range(len(values["years"]))]
     plt.axis("off")
     labels = [
         "Year",
@@ -238,35 +175,31 @@ def plotTable(year_values, date_values):
         cell = table[(0, i)]
         cell.set_height(0.15)
     plt.title("Cumulative values")
-    plt.show()
+    if show:
+        plt.show()
 
 
-def predictGrowth(dates_as_numbers, datas, labels, title, y_label="€"):
+def predictGrowth(dates_as_numbers, datas, labels, title, y_label="€",
+                  show=True):
+    forecast = growthForecast(
+        dates_as_numbers, datas, labels, YEARS_PREDICTION)
+    fitted_x = forecast["dates_as_numbers"]
     for i in range(len(datas)):
-        p = np.polyfit(dates_as_numbers, np.log(np.array(datas[i])), 1)
-        a = np.exp(p[1])
-        b = p[0]
-        fitted_x = np.linspace(
-            dates_as_numbers[0], 366 * YEARS_PREDICTION + dates_as_numbers[-1], 100)
-        fitted_y = a * np.exp(b * fitted_x)
+        series = forecast["series"][labels[i]]
         plotDataPerDay(
             dates_as_numbers, [datas[i]], [labels[i]], title, y_label, False)
         plotDataPerDay(
-            fitted_x, [fitted_y], [f"{labels[i]} prediction"], title, y_label,
-            False, line_style="--")
+            fitted_x, [series["prediction"]], [f"{labels[i]} prediction"],
+            title, y_label, False, line_style="--")
+        plt.fill_between(
+            fitted_x, series["lower"], series["upper"],
+            color=plt.gca().lines[-1].get_color(), alpha=0.15)
     plt.grid(axis='y')
-    plt.show()
-
+    if show:
+        plt.show()
 
-def main():
-    # Read data
-    csv_file_name, delimiter = readCommandLineArguments()
-    date_values, year_values = readCsvData(csv_file_name, delimiter)
-    percentage_yearly_growth = percentageYearlyGrowth(
-        year_values, ["years", "stock_profits"], ["stock_profits", "savings"])
-    absolute_yearly_growth = absoluteYearlyGrowth(year_values, ["years"])
 
-    # Plot data
+def plotWealthProgress(date_values, year_values, show=True):
     plotDataPerDay(
         date_values["dates_as_numbers"],
         [
@@ -274,21 +207,25 @@ def main():
             date_values["stock_profits"],
             date_values["equities"],
         ], ["Savings", "Stock profits", "Equity"],
-        "Wealth progress", "€")
+        "Wealth progress", "€", show)
+
 
-    # Plot growth prediction
+def plotWealthPrediction(date_values, year_values, show=True):
     predictGrowth(
         date_values["dates_as_numbers"],
         [
             date_values["savings"],
             date_values["equities"],
         ], ["Savings", "Equity"],
-        "Wealth progress prediction")
+        "Wealth progress prediction", show=show)
 
-    # Annual growth in table
-    plotTable(year_values, date_values)
 
-    # Plot growth
+def plotCumulativeTable(date_values, year_values, show=True):
+    plotTable(year_values, date_values, show)
+
+
+def plotYearlyGrowth(date_values, year_values, show=True):
+    percentage_yearly_growth = yearlyGrowth(year_values)["percentage"]
     y = [
         percentage_yearly_growth["stock_profits_per_equity"],
         percentage_yearly_growth["savings_per_equity"],
@@ -306,12 +243,40 @@ def main():
     for i in range(len(y)):
         plt.subplot(grid_x, grid_y, i+1)
         plotBarChart(percentage_yearly_growth["years"], y[i], titles[i], False)
-    plt.show()
+    if show:
+        plt.show()
+
 
+def plotSavingsVsStockProfits(date_values, year_values, show=True):
+    absolute_yearly_growth = yearlyGrowth(year_values)["absolute"]
     plot2Datasets(
         absolute_yearly_growth["years"], absolute_yearly_growth["savings"],
         absolute_yearly_growth["stock_profits"], "Savings VS stock profits",
-        "€", "€", "Savings", "Stock profits")
+        "€", "€", "Savings", "Stock profits", show=show)
+
+
+# Figures in the order they are shown, each drawn on the current figure
+WEALTH_FIGURES = {
+    "wealth_progress": plotWealthProgress,
+    "wealth_prediction": plotWealthPrediction,
+    "cumulative_values": plotCumulativeTable,
+    "yearly_growth": plotYearlyGrowth,
+    "savings_vs_stock_profits": plotSavingsVsStockProfits,
+}
+
+
+def main(argv=None):
+    # Read data
+    csv_file_name, delimiter = readCommandLineArguments(argv)
+    with stage("read_csv_data") as record:
+        date_values, year_values = readWealthData(csv_file_name, delimiter)
+        record["rows"] = len(date_values["dates_as_numbers"])
+
+    # Plot data, a figure's time includes the time its window is open
+    for figure_name, plot_function in WEALTH_FIGURES.items():
+        with stage(figure_name):
+            plot_function(date_values, year_values)
+    printProfile()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,140 @@
+import contextlib
+import cProfile
+import json
+import os
+import resource
+import sys
+import time
+
+
+PROFILE_VARIABLE = "FINANCIAL_PROGRESS_PROFILE"
+PROFILE_STAGE_VARIABLE = "FINANCIAL_PROGRESS_PROFILE_STAGE"
+PROFILE_FORMATS = ["table", "json"]
+CPROFILE_FILE = "{}.prof"
+
+# Stages timed in this process, see stage(). Nothing is recorded unless
+# profiling is enabled.
+PROFILE = {
+    "enabled": False,
+    "format": "table",
+    "cprofile_stage": None,
+    "depth": 0,
+    "stages": [],
+}
+
+# Returned by stage() when profiling is disabled, rows written to it are
+# thrown away
+DISABLED_STAGE = contextlib.nullcontext({})
+
+
+def configureProfiling(output_format=None, cprofile_stage=None):
+    # Command line options win over the environment, "1" means a table
+    output_format = output_format or os.environ.get(PROFILE_VARIABLE)
+    cprofile_stage = cprofile_stage or os.environ.get(PROFILE_STAGE_VARIABLE)
+    if not output_format and not cprofile_stage:
+        return
+    if output_format not in PROFILE_FORMATS:
+        output_format = "table"
+    PROFILE.update({
+        "enabled": True,
+        "format": output_format,
+        "cprofile_stage": cprofile_stage,
+        "depth": 0,
+        "stages": [],
+    })
+
+
+def popProfileArguments(argv):
+    # For scripts with positional arguments only: --profile [FORMAT] and
+    # --profile-stage STAGE, also with "=", are taken out and the rest
+    # returned. A word after --profile is its format only if it is one.
+    remaining = []
+    output_format = cprofile_stage = None
+    arguments = iter(argv)
+    for argument in arguments:
+        option, has_value, value = argument.partition("=")
+        if option == "--profile":
+            if has_value and value not in PROFILE_FORMATS:
+                raise SystemExit(
+                    f"--profile: invalid format ({value}), choose from "
+                    + ", ".join(PROFILE_FORMATS))
+            output_format = value or "table"
+            if not has_value:
+                following = next(arguments, None)
+                if following in PROFILE_FORMATS:
+                    output_format = following
+                elif following is not None:
+                    remaining.append(following)
+        elif option == "--profile-stage":
+            cprofile_stage = value if has_value else next(arguments, None)
+            if not cprofile_stage:
+                raise SystemExit("--profile-stage: expected a stage name")
+        else:
+            remaining.append(argument)
+    configureProfiling(output_format, cprofile_stage)
+    return remaining
+
+
+def peakRss():
+    # Bytes, ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+@contextlib.contextmanager
+def profiledStage(name, rows):
+    record = {"stage": name, "depth": PROFILE["depth"], "rows": rows}
+    PROFILE["stages"].append(record)
+    PROFILE["depth"] += 1
+    profiler = None
+    if name == PROFILE["cprofile_stage"]:
+        profiler = cProfile.Profile()
+        profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record["seconds"] = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            record["cprofile_file"] = CPROFILE_FILE.format(name)
+            profiler.dump_stats(record["cprofile_file"])
+        record["peak_rss_bytes"] = peakRss()
+        PROFILE["depth"] -= 1
+
+
+def stage(name, rows=None):
+    # with stage("decode") as record: ... record["rows"] = len(df)
+    if not PROFILE["enabled"]:
+        return DISABLED_STAGE
+    return profiledStage(name, rows)
+
+
+def rowsPerSecond(record):
+    if record["rows"] is None or record["seconds"] <= 0:
+        return None
+    return record["rows"] / record["seconds"]
+
+
+def printProfile(file=sys.stderr):
+    if not PROFILE["enabled"]:
+        return
+    if PROFILE["format"] == "json":
+        for record in PROFILE["stages"]:
+            print(json.dumps(
+                {**record, "rows_per_second": rowsPerSecond(record)}),
+                file=file)
+        return
+    print("{:<28} {:>10} {:>12} {:>14} {:>12}".format(
+        "Stage", "Seconds", "Rows", "Rows/s", "Peak RSS MiB"), file=file)
+    for record in PROFILE["stages"]:
+        rows_per_second = rowsPerSecond(record)
+        print("{:<28} {:>10.4f} {:>12} {:>14} {:>12.1f}".format(
+            "  " * record["depth"] + record["stage"], record["seconds"],
+            "" if record["rows"] is None else f"{record['rows']:,}",
+            "" if rows_per_second is None else f"{rows_per_second:,.0f}",
+            record["peak_rss_bytes"] / 2 ** 20), file=file)
+    for record in PROFILE["stages"]:
+        if "cprofile_file" in record:
+            print(f"cProfile of {record['stage']}: {record['cprofile_file']}",
+                  file=file)
@@ -0,0 +1,111 @@
+import numpy as np
+
+
+TARGET_EQUITY = 1_000_000
+MONTHS_IN_YEAR = 12
+
+
+def monthlyReturns(annual_return_percent):
+    return (1 + np.asarray(annual_return_percent, float) / 100) ** (
+        1 / float(MONTHS_IN_YEAR))
+
+
+def monthlySavings(monthly_savings, savings_increase_percent, years):
+    # Savings grow once a year, (1 + i * increase) times the first year's
+    year_indices = np.repeat(np.arange(years), MONTHS_IN_YEAR)
+    increase = np.asarray(savings_increase_percent, float)[..., None]
+    return (1 + year_indices * increase / 100) * np.asarray(
+        monthly_savings, float)[..., None]
+
+
+def recursiveEquities(start_equity, savings, monthly_return):
+    # E_m = r * E_(m - 1) + s_m month by month
+    equities = np.empty_like(savings)
+    equity = start_equity
+    for month in range(savings.shape[-1]):
+        equity = monthly_return * equity + savings[..., month]
+        equities[..., month] = equity
+    return equities
+
+
+def projectEquity(start_equity, monthly_savings, savings_increase_percent,
+                  annual_return_percent, years):
+    # Parameters are scalars or arrays broadcast together, the returned
+    # paths have the shape (..., years * 12 + 1) with month 0 first
+    start_equity, monthly_savings, savings_increase_percent, \
+        annual_return_percent = np.broadcast_arrays(
+            np.asarray(start_equity, float),
+            np.asarray(monthly_savings, float),
+            np.asarray(savings_increase_percent, float),
+            np.asarray(annual_return_percent, float))
+    savings = monthlySavings(monthly_savings, savings_increase_percent, years)
+    monthly_return = monthlyReturns(annual_return_percent)[..., None]
+
+    # E_m = r^m * (E_0 + sum_{k <= m} s_k * r^-k)
+    months = np.arange(1, years * MONTHS_IN_YEAR + 1)
+    growth = monthly_return ** months
+    with np.errstate(divide="ignore", invalid="ignore"):
+        equities = growth * (
+            start_equity[..., None] + np.cumsum(savings / growth, axis=-1))
+
+    # r^m is zero at -100 % and underflows to zero near it, those paths are
+    # summed month by month
+    is_vanishing = growth[..., -1] == 0
+    if np.any(is_vanishing):
+        equities[is_vanishing] = recursiveEquities(
+            start_equity[is_vanishing], savings[is_vanishing],
+            monthly_return[is_vanishing][..., 0])
+    cumulative_savings = start_equity[..., None] + np.cumsum(savings, axis=-1)
+    return {
+        "equities": np.concatenate(
+            [start_equity[..., None], equities], axis=-1),
+        "savings": np.concatenate(
+            [start_equity[..., None], cumulative_savings], axis=-1),
+    }
+
+
+def annualValues(monthly_values):
+    return monthly_values[..., ::MONTHS_IN_YEAR]
+
+
+def firstCrossingMonths(equities, target=TARGET_EQUITY, is_monotonic=True):
+    # Index of the first month at or above the target, -1 if never reached.
+    # Non-decreasing paths are binary searched, others scanned.
+    equities = np.asarray(equities)
+    n_months = equities.shape[-1]
+    paths = equities.reshape(-1, n_months)
+    if not is_monotonic:
+        is_above = paths >= target
+        months = np.where(is_above.any(axis=-1), is_above.argmax(axis=-1), -1)
+        return months.reshape(equities.shape[:-1])
+
+    rows = np.arange(len(paths))
+    low = np.zeros(len(paths), dtype=np.int64)
+    high = np.full(len(paths), n_months, dtype=np.int64)
+    while np.any(low < high):
+        middle = (low + high) // 2
+        is_active = low < high
+        is_above = paths[rows, np.minimum(middle, n_months - 1)] >= target
+        high = np.where(is_active & is_above, middle, high)
+        low = np.where(is_active & ~is_above, middle + 1, low)
+    months = np.where(low < n_months, low, -1)
+    return months.reshape(equities.shape[:-1])
+
+
+def isMonotonic(projection, annual_return_percent):
+    # Equity never decreases without negative returns, savings or equity
+    savings = projection["savings"]
+    return bool(
+        np.all(savings[..., 0] >= 0) and
+        np.all(np.diff(savings, axis=-1) >= 0) and
+        np.all(np.asarray(annual_return_percent) >= 0))
+
+
+def monthsToTarget(start_equity, monthly_savings, savings_increase_percent,
+                   annual_return_percent, years, target=TARGET_EQUITY):
+    projection = projectEquity(
+        start_equity, monthly_savings, savings_increase_percent,
+        annual_return_percent, years)
+    return firstCrossingMonths(
+        projection["equities"], target,
+        isMonotonic(projection, annual_return_percent))
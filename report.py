@@ -0,0 +1,155 @@
+import argparse
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.backends.backend_pdf import PdfPages
+
+from capital_income_tax_calculator import (
+    aggregateAnnualData,
+    computeAnnualTaxes,
+    plotAnnualData,
+    readDividendCsv,
+    readStockCsv,
+)
+from export_cache import CACHE_DIRECTORY, readCachedCsv
+from plot_wealth_chart import DELIMITER, WEALTH_FIGURES, readWealthData
+
+
+REPORT_DIRECTORY = "reports"
+FIGURE_FORMATS = ["png", "svg", "pdf"]
+FIGURE_SIZE = (16, 9)
+TAX_FIGURE = "capital_income"
+
+# Date values and year values of every wealth history, read once by the
+# parent and given to the pool workers by their initializer
+WEALTH_DATA = {}
+
+
+def portfolioName(file_name):
+    return os.path.splitext(os.path.basename(file_name))[0]
+
+
+def accountName(file_name):
+    # Exports have fixed names, the account is the directory they are in
+    return os.path.basename(os.path.dirname(os.path.abspath(file_name)))
+
+
+def reportTasks(wealth_csv_files, tax_csv_files):
+    # (portfolio, figure name, input files) for every figure of the report
+    tasks = []
+    for csv_file_name in wealth_csv_files:
+        for figure_name in WEALTH_FIGURES:
+            tasks.append(
+                (portfolioName(csv_file_name), figure_name, csv_file_name))
+    for stock_csv_file, dividend_csv_file in tax_csv_files:
+        tasks.append((
+            accountName(dividend_csv_file), TAX_FIGURE,
+            (stock_csv_file, dividend_csv_file)))
+    return tasks
+
+
+def readWealthHistories(tasks, delimiter=DELIMITER):
+    wealth_data = {}
+    for _, figure_name, input_files in tasks:
+        if figure_name != TAX_FIGURE and input_files not in wealth_data:
+            wealth_data[input_files] = readWealthData(input_files, delimiter)
+    return wealth_data
+
+
+def setWealthData(wealth_data):
+    WEALTH_DATA.update(wealth_data)
+
+
+def drawFigure(figure_name, input_files, delimiter=DELIMITER,
+               cache_directory=CACHE_DIRECTORY, wealth_data=WEALTH_DATA):
+    fig = plt.figure(figsize=FIGURE_SIZE)
+    if figure_name == TAX_FIGURE:
+        stock_csv_file, dividend_csv_file = input_files
+        annual_df = aggregateAnnualData(
+            readCachedCsv(stock_csv_file, readStockCsv, cache_directory),
+            readCachedCsv(dividend_csv_file, readDividendCsv, cache_directory))
+        plotAnnualData(computeAnnualTaxes(annual_df), show=False)
+    else:
+        date_values, year_values = wealth_data[input_files] \
+            if input_files in wealth_data else \
+            readWealthData(input_files, delimiter)
+        WEALTH_FIGURES[figure_name](date_values, year_values, show=False)
+    return fig
+
+
+def renderFigure(task, output_directory, figure_format, delimiter=DELIMITER):
+    portfolio, figure_name, input_files = task
+    directory = os.path.join(output_directory, portfolio)
+    os.makedirs(directory, exist_ok=True)
+    file_name = os.path.join(directory, f"{figure_name}.{figure_format}")
+    fig = drawFigure(figure_name, input_files, delimiter)
+    try:
+        fig.savefig(file_name)
+    finally:
+        plt.close(fig)
+    return file_name
+
+
+def renderReport(tasks, output_directory=REPORT_DIRECTORY,
+                 figure_format="png", workers=None, delimiter=DELIMITER):
+    # Figures are independent, each worker draws, saves and closes one
+    with ProcessPoolExecutor(
+            max_workers=workers, initializer=setWealthData,
+            initargs=(readWealthHistories(tasks, delimiter),)) as executor:
+        return list(executor.map(
+            renderFigure, tasks, [output_directory] * len(tasks),
+            [figure_format] * len(tasks), [delimiter] * len(tasks)))
+
+
+def renderPdfReport(tasks, file_name, delimiter=DELIMITER):
+    # A multi-page PDF is written by one process, page after page
+    wealth_data = readWealthHistories(tasks, delimiter)
+    with PdfPages(file_name) as pdf:
+        for portfolio, figure_name, input_files in tasks:
+            fig = drawFigure(
+                figure_name, input_files, delimiter, wealth_data=wealth_data)
+            try:
+                fig.suptitle(portfolio)
+                pdf.savefig(fig)
+            finally:
+                plt.close(fig)
+    return [file_name]
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Render every chart to files without opening windows")
+    parser.add_argument(
+        "wealth_csv_files", nargs="*", metavar="CSV",
+        help="Wealth histories, e.g. omaisuus.csv or snapshots.sqlite")
+    parser.add_argument(
+        "--tax", nargs=2, action="append", default=[],
+        metavar=("STOCK_CSV", "DIVIDEND_CSV"),
+        help="Nordnet exports to draw the capital income chart from")
+    parser.add_argument("--delimiter", default=DELIMITER)
+    parser.add_argument("--output-directory", default=REPORT_DIRECTORY)
+    parser.add_argument("--format", choices=FIGURE_FORMATS, default="png")
+    parser.add_argument(
+        "--pdf", help="Write all figures to one multi-page PDF file instead")
+    parser.add_argument("--workers", type=int)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    tasks = reportTasks(args.wealth_csv_files, args.tax)
+    if args.pdf:
+        file_names = renderPdfReport(tasks, args.pdf, args.delimiter)
+    else:
+        file_names = renderReport(
+            tasks, args.output_directory, args.format, args.workers,
+            args.delimiter)
+    for file_name in file_names:
+        print(file_name)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,362 @@
+import argparse
+import datetime
+import hashlib
+import json
+import os
+
+import numpy as np
+import yaml
+
+from atomic_write import writeAtomically
+from period_aggregates import (
+    CSV_FILE_NAME,
+    DELIMITER,
+    dateValues,
+    periodEndNumbers,
+    periodStarts,
+    readSnapshotColumns,
+)
+from projection import MONTHS_IN_YEAR, TARGET_EQUITY, projectEquity
+from table_renderer import MACHINE_FORMATS, TABLE_FORMATS, writeTable
+
+
+SCENARIO_FILE = "scenarios.yaml"
+
+# Plans are projected this far to find when they reach the target
+MAX_PROJECTION_YEARS = 60
+
+# Annual returns searched for the implied realised return, in percent
+MIN_IMPLIED_RETURN = -90.0
+MAX_IMPLIED_RETURN = 200.0
+BISECTION_STEPS = 50
+
+# Increase when the results change so old cached results are not used
+RESULT_CACHE_VERSION = 2
+
+# Scenario keys and their defaults, results depend on all of them
+SCENARIO_DEFAULTS = {
+    "start_date": None,
+    "start_equity": None,
+    "monthly_savings": None,
+    "savings_increase_percent": 0.0,
+    "annual_return_percent": None,
+    "target": float(TARGET_EQUITY),
+}
+RESULT_KEYS = [
+    "elapsed_months",
+    "actual_equity",
+    "planned_equity",
+    "tracking_error_percent",
+    "months_ahead",
+    "plan_months_to_target",
+    "months_to_target",
+    "implied_return_percent",
+]
+INTEGER_KEYS = [
+    "elapsed_months",
+    "months_ahead",
+    "plan_months_to_target",
+    "months_to_target",
+]
+
+
+def readScenarios(file_name):
+    # "scenarios" list of name, monthly_savings and annual_return_percent,
+    # optionally start_date, start_equity, savings_increase_percent and
+    # target. Plans start from the first snapshot and its equity by default.
+    with open(file_name) as file:
+        definitions = yaml.safe_load(file)["scenarios"]
+    scenarios = []
+    for i, definition in enumerate(definitions):
+        scenario = {"name": str(definition.get("name", i + 1))}
+        for key, default in SCENARIO_DEFAULTS.items():
+            value = definition.get(key, default)
+            if value is None and key in ("monthly_savings",
+                                         "annual_return_percent"):
+                raise ValueError(
+                    f"Scenario {scenario['name']} has no {key} ({file_name})")
+            if isinstance(value, datetime.datetime):
+                value = value.date()
+            if isinstance(value, datetime.date):
+                value = value.isoformat()
+            scenario[key] = value
+        scenarios.append(scenario)
+    names = [scenario["name"] for scenario in scenarios]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Scenario names are not unique ({file_name})")
+    return scenarios
+
+
+def scenarioKey(scenario):
+    # Name is left out, renaming a scenario keeps its result
+    return json.dumps(
+        {key: scenario[key] for key in SCENARIO_DEFAULTS}, sort_keys=True)
+
+
+def monthlyHistory(file_name, delimiter=DELIMITER):
+    # Equity at the end of every calendar month from the first snapshot's
+    # month on, also of months without a snapshot, interpolated between the
+    # snapshots around the month end. The last month ends to the last
+    # snapshot.
+    days, months, years, savings, stock_profits = readSnapshotColumns(
+        file_name, delimiter)
+    date_values = dateValues(days, months, years, savings, stock_profits)
+    dates_as_numbers = date_values["dates_as_numbers"]
+    snapshot_months = periodStarts(months, years, "month")
+    months = np.arange(snapshot_months[0], snapshot_months[-1] + 1)
+    month_ends = periodEndNumbers(months, "month")
+    month_ends[-1] = dates_as_numbers[-1]
+    return {
+        "months": months,
+        "equities": np.interp(
+            month_ends, dates_as_numbers, date_values["equities"]),
+    }
+
+
+def historyHash(history):
+    sha256 = hashlib.sha256()
+    for key in ["months", "equities"]:
+        sha256.update(np.ascontiguousarray(
+            history[key], dtype=np.float64).tobytes())
+    return sha256.hexdigest()
+
+
+def startMonth(scenario):
+    # Months since January 1970 of the start date
+    try:
+        date = datetime.date.fromisoformat(str(scenario["start_date"]))
+    except ValueError:
+        raise ValueError(
+            f"Scenario {scenario['name']} has an invalid start_date "
+            f"({scenario['start_date']}), expected YYYY-MM-DD") from None
+    return (date.year - 1970) * 12 + date.month - 1
+
+
+def startIndices(scenarios, history):
+    # Month of the history every plan starts from, the history has every
+    # month
+    months = history["months"]
+    start_months = np.array([
+        months[0] if scenario["start_date"] is None else
+        startMonth(scenario) for scenario in scenarios])
+    indices = start_months - months[0]
+    if np.any(indices < 0) or np.any(indices >= len(months)):
+        raise ValueError("Scenario starts outside the wealth history")
+    return indices
+
+
+def scenarioParameters(scenarios, history, start_indices):
+    def column(key):
+        return np.array([scenario[key] for scenario in scenarios], float)
+
+    start_equities = np.array([
+        history["equities"][index] if scenario["start_equity"] is None
+        else scenario["start_equity"]
+        for scenario, index in zip(scenarios, start_indices)], float)
+    return (
+        start_equities, column("monthly_savings"),
+        column("savings_increase_percent"), column("annual_return_percent"),
+        column("target"))
+
+
+def firstMonthsAbove(paths, values):
+    # First month of every path at or above its value, -1 if never
+    is_above = paths >= values[:, None]
+    return np.where(is_above.any(axis=1), is_above.argmax(axis=1), -1)
+
+
+def impliedReturns(start_equities, monthly_savings, savings_increases,
+                   actual_equities, elapsed_months):
+    # Annual return with which every plan's savings end at the actual
+    # equity, bisected for all plans at once. Plans with negative savings or
+    # without a return in the searched range get NaN.
+    rows = np.arange(len(start_equities))
+    years = max(int(np.ceil(elapsed_months.max() / MONTHS_IN_YEAR)), 1)
+
+    def endEquities(annual_returns):
+        return projectEquity(
+            start_equities, monthly_savings, savings_increases,
+            annual_returns, years)["equities"][rows, elapsed_months]
+
+    low = np.full(len(rows), MIN_IMPLIED_RETURN)
+    high = np.full(len(rows), MAX_IMPLIED_RETURN)
+    is_found = (
+        (elapsed_months > 0) & (start_equities >= 0) &
+        (monthly_savings >= 0) & (savings_increases >= 0) &
+        (endEquities(low) <= actual_equities) &
+        (endEquities(high) >= actual_equities))
+    for _ in range(BISECTION_STEPS):
+        middle = (low + high) / 2
+        is_below = endEquities(middle) < actual_equities
+        low = np.where(is_below, middle, low)
+        high = np.where(is_below, high, middle)
+    return np.where(is_found, (low + high) / 2, np.nan)
+
+
+def compareScenarios(scenarios, history):
+    # Every plan against the actual monthly equity from its start month on,
+    # all plans in one batch. Returns arrays in scenario order.
+    start_indices = startIndices(scenarios, history)
+    start_equities, monthly_savings, savings_increases, annual_returns, \
+        targets = scenarioParameters(scenarios, history, start_indices)
+    actual = history["equities"]
+    elapsed_months = len(actual) - 1 - start_indices
+
+    # At least as long as the longest history compared
+    paths = projectEquity(
+        start_equities, monthly_savings, savings_increases, annual_returns,
+        max(MAX_PROJECTION_YEARS,
+            -(-int(elapsed_months.max()) // MONTHS_IN_YEAR)))["equities"]
+    rows = np.arange(len(scenarios))
+
+    # Actual equity of the months since every plan's start, NaN after the
+    # last month
+    offsets = np.arange(elapsed_months.max() + 1)
+    is_elapsed = offsets <= elapsed_months[:, None]
+    aligned = np.where(is_elapsed, actual[np.minimum(
+        start_indices[:, None] + offsets, len(actual) - 1)], np.nan)
+    planned = paths[:, :len(offsets)]
+    is_compared = is_elapsed & (offsets > 0) & (planned > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        deviations = np.where(is_compared, (aligned - planned) / planned, 0)
+        tracking_errors = 100 * np.sqrt(
+            (deviations ** 2).sum(axis=1) / is_compared.sum(axis=1))
+
+    # Months until the plan has the actual equity, negative when the plan
+    # had it earlier
+    actual_equities = actual[-1]
+    crossing_months = firstMonthsAbove(
+        paths, np.full(len(scenarios), actual_equities))
+    months_ahead = np.where(
+        crossing_months >= 0, crossing_months - elapsed_months, np.nan)
+    plan_months_to_target = firstMonthsAbove(paths, targets).astype(float)
+    plan_months_to_target[plan_months_to_target < 0] = np.nan
+    return {
+        "elapsed_months": elapsed_months,
+        "actual_equity": np.full(len(scenarios), actual_equities),
+        "planned_equity": paths[rows, elapsed_months],
+        "tracking_error_percent": tracking_errors,
+        "months_ahead": months_ahead,
+        "plan_months_to_target": plan_months_to_target,
+        "months_to_target": np.maximum(
+            plan_months_to_target - months_ahead - elapsed_months, 0),
+        "implied_return_percent": impliedReturns(
+            start_equities, monthly_savings, savings_increases,
+            actual_equities, elapsed_months),
+    }
+
+
+def resultCacheFile(scenario_file):
+    return f"{scenario_file}.results.json"
+
+
+def readResultCache(cache_file, history_hash):
+    # Results per scenario definition, all of them are stale when the
+    # history changes
+    if not os.path.exists(cache_file):
+        return {}
+    with open(cache_file) as file:
+        cache = json.load(file)
+    if cache.get("version") != RESULT_CACHE_VERSION or \
+            cache.get("history_hash") != history_hash:
+        return {}
+    return cache["results"]
+
+
+def writeResultCache(cache_file, history_hash, results):
+    def write(path):
+        with open(path, "w") as file:
+            json.dump({
+                "version": RESULT_CACHE_VERSION,
+                "history_hash": history_hash,
+                "results": results,
+            }, file)
+
+    writeAtomically(cache_file, write)
+
+
+def cachedComparison(scenarios, history, cache_file=None):
+    # Only scenarios without a cached result are compared, in one batch.
+    # Returns a result dict per scenario.
+    history_hash = historyHash(history)
+    cached = {} if cache_file is None else readResultCache(
+        cache_file, history_hash)
+    keys = [scenarioKey(scenario) for scenario in scenarios]
+    missing = [
+        scenario for scenario, key in zip(scenarios, keys)
+        if key not in cached]
+    if missing:
+        compared = compareScenarios(missing, history)
+        for i, scenario in enumerate(missing):
+            cached[scenarioKey(scenario)] = {
+                key: None if np.isnan(compared[key][i]) else
+                float(compared[key][i]) for key in RESULT_KEYS}
+        if cache_file is not None:
+            writeResultCache(cache_file, history_hash, {
+                key: cached[key] for key in keys})
+    return [cached[key] for key in keys]
+
+
+def printComparison(scenarios, results, table_format="ascii"):
+    texts = [
+        "#",
+        "Months",
+        "Planned equity",
+        "Tracking error %",
+        "Months ahead",
+        "Plan months to target",
+        "Months to target",
+        "Implied return %",
+        "Scenario",
+    ]
+    keys = [
+        "elapsed_months",
+        "planned_equity",
+        "tracking_error_percent",
+        "months_ahead",
+        "plan_months_to_target",
+        "months_to_target",
+        "implied_return_percent",
+    ]
+    missing = None if table_format in MACHINE_FORMATS else "-"
+    values = [list(range(1, len(scenarios) + 1))]
+    for key in keys:
+        values.append([
+            missing if result[key] is None else
+            int(result[key]) if key in INTEGER_KEYS else result[key]
+            for result in results])
+    values.append([scenario["name"] for scenario in scenarios])
+    writeTable(texts, values, table_format, total_row=False)
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Compare savings plans with the actual wealth history")
+    parser.add_argument("scenario_file", nargs="?", default=SCENARIO_FILE)
+    parser.add_argument(
+        "--wealth", default=CSV_FILE_NAME,
+        help="omaisuus.csv style file or a snapshot store")
+    parser.add_argument("--delimiter", default=DELIMITER)
+    parser.add_argument(
+        "--format", choices=TABLE_FORMATS, default="ascii",
+        help="Print the table as text or for other programs")
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help="Compare every scenario without reading or writing results")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    scenarios = readScenarios(args.scenario_file)
+    history = monthlyHistory(args.wealth, args.delimiter)
+    results = cachedComparison(
+        scenarios, history,
+        None if args.no_cache else resultCacheFile(args.scenario_file))
+    if args.format not in MACHINE_FORMATS:
+        print("Equity now: {:,.0f}".format(float(history["equities"][-1])))
+    printComparison(scenarios, results, args.format)
+
+
+if __name__ == "__main__":
+    main()
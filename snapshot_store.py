@@ -0,0 +1,168 @@
+import argparse
+import datetime
+import json
+import sqlite3
+
+
+SNAPSHOT_FILE = "snapshots.sqlite"
+SNAPSHOT_EXTENSIONS = (".sqlite", ".db")
+CSV_HEADER = "day,month,year,savings,stock_profits"
+
+# Dates are ISO strings so the primary key orders and ranges them, the year
+# index finds the first and last snapshot of every year
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS snapshots (
+    date TEXT PRIMARY KEY,
+    year INTEGER NOT NULL,
+    month INTEGER NOT NULL,
+    day INTEGER NOT NULL,
+    savings REAL NOT NULL,
+    stock_profits REAL NOT NULL,
+    portfolio_balance REAL,
+    cash REAL,
+    finance_info TEXT
+);
+CREATE INDEX IF NOT EXISTS snapshots_year ON snapshots (year, date);
+"""
+SNAPSHOT_COLUMNS = ["day", "month", "year", "savings", "stock_profits"]
+
+
+def isSnapshotStore(file_name):
+    return str(file_name).endswith(SNAPSHOT_EXTENSIONS)
+
+
+def openSnapshotStore(file_name=SNAPSHOT_FILE):
+    connection = sqlite3.connect(file_name)
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def appendSnapshots(rows, file_name=SNAPSHOT_FILE):
+    # (date, savings, stock_profits, portfolio_balance, cash, finance_info)
+    # rows, a later snapshot of the same day replaces the earlier one
+    with openSnapshotStore(file_name) as connection:
+        connection.executemany(
+            "INSERT OR REPLACE INTO snapshots "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [(date.isoformat(), date.year, date.month, date.day, savings,
+              stock_profits, portfolio_balance, cash,
+              None if finance_info is None else json.dumps(finance_info))
+             for date, savings, stock_profits, portfolio_balance, cash,
+             finance_info in rows])
+    connection.close()
+
+
+def appendSnapshot(date, savings, stock_profits, portfolio_balance=None,
+                   cash=None, finance_info=None, file_name=SNAPSHOT_FILE):
+    appendSnapshots(
+        [(date, savings, stock_profits, portfolio_balance, cash,
+          finance_info)], file_name)
+
+
+def importCsv(csv_file_name, delimiter=",", file_name=SNAPSHOT_FILE):
+    # NumPy is imported here so equity.py starts without it
+    import numpy as np
+    data = np.loadtxt(
+        csv_file_name, delimiter=delimiter, skiprows=1, dtype=np.int64,
+        ndmin=2)
+    appendSnapshots(
+        [(datetime.date(int(year), int(month), int(day)), int(savings),
+          int(stock_profits), None, None, None)
+         for day, month, year, savings, stock_profits in data], file_name)
+    return len(data)
+
+
+def querySnapshots(query, params=(), file_name=SNAPSHOT_FILE):
+    # Columns of omaisuus.csv as arrays, in date order
+    import numpy as np
+    with openSnapshotStore(file_name) as connection:
+        rows = connection.execute(
+            "SELECT {} FROM snapshots WHERE {} ORDER BY date".format(
+                ", ".join(SNAPSHOT_COLUMNS), query), params).fetchall()
+    connection.close()
+    if not rows:
+        raise ValueError(f"Snapshot store ({file_name}) has no snapshots")
+    days, months, years, savings, stock_profits = np.array(
+        rows, dtype=np.float64).T
+    return (
+        days.astype(np.int64), months.astype(np.int64),
+        years.astype(np.int64), savings, stock_profits)
+
+
+def readSnapshots(file_name=SNAPSHOT_FILE, start_date=None, end_date=None):
+    # Snapshots between the dates, both included
+    return querySnapshots(
+        "date >= ? AND date <= ?",
+        (start_date.isoformat() if start_date else "",
+         end_date.isoformat() if end_date else "9999"), file_name)
+
+
+def readYearEndpoints(file_name=SNAPSHOT_FILE, start_year=None,
+                      end_year=None):
+    # First and last snapshot of every year, found from the year index, and
+    # the first snapshot of the year after end_year. Year-end values
+    # interpolate between a year's last snapshot and the next year's first,
+    # so these give the same year values as the full history.
+    start_year = start_year or 0
+    end_year = end_year or 9998
+    return querySnapshots(
+        "date IN (SELECT MIN(date) FROM snapshots WHERE year BETWEEN ? AND ? "
+        "GROUP BY year UNION SELECT MAX(date) FROM snapshots "
+        "WHERE year BETWEEN ? AND ? GROUP BY year)",
+        (start_year, end_year + 1, start_year, end_year), file_name)
+
+
+def readSnapshotData(file_name=SNAPSHOT_FILE, start_date=None,
+                     end_date=None):
+    from period_aggregates import wealthValues
+    return wealthValues(*readSnapshots(file_name, start_date, end_date))
+
+
+def readYearValues(file_name=SNAPSHOT_FILE, start_year=None, end_year=None):
+    from period_aggregates import wealthValues
+    year_values = wealthValues(
+        *readYearEndpoints(file_name, start_year, end_year))[1]
+    if end_year is None:
+        return year_values
+    is_included = year_values["years"] <= end_year
+    return {key: values[is_included] for key, values in year_values.items()}
+
+
+def printCsv(snapshots):
+    print(CSV_HEADER)
+    for row in zip(*snapshots):
+        print(",".join(f"{value:g}" for value in row))
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Import or print wealth snapshots")
+    parser.add_argument("--store", default=SNAPSHOT_FILE)
+    parser.add_argument(
+        "--import-csv", metavar="CSV",
+        help="Add the snapshots of a CSV file such as omaisuus.csv")
+    parser.add_argument("--delimiter", default=",")
+    parser.add_argument("--start", type=datetime.date.fromisoformat)
+    parser.add_argument("--end", type=datetime.date.fromisoformat)
+    parser.add_argument(
+        "--year-endpoints", action="store_true",
+        help="Print only the first and last snapshot of every year")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    if args.import_csv:
+        print("Imported snapshots:", importCsv(
+            args.import_csv, args.delimiter, args.store))
+        return
+    if args.year_endpoints:
+        printCsv(readYearEndpoints(
+            args.store, args.start and args.start.year,
+            args.end and args.end.year))
+    else:
+        printCsv(readSnapshots(args.store, args.start, args.end))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import csv
+import io
+import json
+import math
+import sys
+
+import numpy as np
+
+
+TABLE_FORMATS = ["ascii", "csv", "tsv", "json", "markdown"]
+
+# Formats read by other programs, values are written without rounding
+MACHINE_FORMATS = ["csv", "tsv", "json"]
+FLOAT_TYPES = (float, np.float64)
+
+
+def valueTexts(column):
+    # Floats with two decimals, other values as they are printed
+    return [
+        f"{value:.2f}" if type(value) in FLOAT_TYPES else str(value)
+        for value in column]
+
+
+def plainValue(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def asciiTable(texts, values, total_row=True):
+    # Header widths only, a longer value widens its row. The last row, the
+    # totals, is separated from the others.
+    widths = [5 if i == 0 else max(9, len(text)) for i, text in
+              enumerate(texts)]
+    line = (sum(widths) + 4 + 3 * max(0, len(widths) - 1)) * "-"
+    columns = [
+        [text.rjust(width) for text in valueTexts(column)]
+        for column, width in zip(values, widths)]
+    rows = ["| " + "".join(cells) for cells in zip(*[
+        [cell + " | " for cell in column] for column in columns])]
+    header = "| " + "".join(
+        text.rjust(width) + " | " for text, width in zip(texts, widths))
+    if rows and total_row:
+        rows = rows[:-1] + [line] + rows[-1:]
+    return "\n".join([line, header, line] + rows + [line, ""])
+
+
+def markdownTable(texts, values):
+    columns = [valueTexts(column) for column in values]
+    lines = [
+        "| " + " | ".join(texts) + " |",
+        "|" + "|".join(
+            ":---" if i == 0 else "---:" for i in range(len(texts))) + "|",
+    ]
+    lines += ["| " + " | ".join(cells) + " |" for cells in zip(*columns)]
+    return "\n".join(lines + [""])
+
+
+def delimitedTable(texts, values, delimiter):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator="\n")
+    writer.writerow(texts)
+    writer.writerows(zip(*[
+        ["" if value is None else value for value in map(plainValue, column)]
+        for column in values]))
+    return buffer.getvalue()
+
+
+def jsonTable(texts, values):
+    return json.dumps([
+        dict(zip(texts, row)) for row in zip(*[
+            [plainValue(value) for value in column] for column in values])
+    ], indent=1) + "\n"
+
+
+TABLE_RENDERERS = {
+    "ascii": asciiTable,
+    "csv": lambda texts, values: delimitedTable(texts, values, ","),
+    "tsv": lambda texts, values: delimitedTable(texts, values, "\t"),
+    "json": jsonTable,
+    "markdown": markdownTable,
+}
+
+
+def renderTable(texts, values, table_format="ascii", total_row=True):
+    # texts are the column headers and values the columns, total_row
+    # separates the last row in ascii tables
+    if table_format == "ascii":
+        return asciiTable(texts, values, total_row)
+    return TABLE_RENDERERS[table_format](texts, values)
+
+
+def writeTable(texts, values, table_format="ascii", file=None,
+               total_row=True):
+    # The whole table in one write
+    (sys.stdout if file is None else file).write(
+        renderTable(texts, values, table_format, total_row))
@@ -0,0 +1,75 @@
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+
+BASE_TAX_PERCENTAGE = 30
+MARGIN_TAX_PERCENTAGE = 34
+MARGIN_TAX_THRESHOLD = 30000
+ZERO_TAX_THRESHOLD = 1000
+N_YEARS_LOSSES_ACCUMULATED = 5
+
+# Tax parameters that differ from the defaults above, e.g.
+# {2014: {"margin_tax_threshold": 40000}}
+TAX_PARAMETERS_BY_YEAR = {}
+
+
+def taxParameters(years, parameters_by_year=TAX_PARAMETERS_BY_YEAR):
+    years = list(years)
+    parameters = {
+        "base_tax_percentage": np.full(len(years), BASE_TAX_PERCENTAGE, float),
+        "margin_tax_percentage": np.full(
+            len(years), MARGIN_TAX_PERCENTAGE, float),
+        "margin_tax_threshold": np.full(
+            len(years), MARGIN_TAX_THRESHOLD, float),
+        "zero_tax_threshold": np.full(len(years), ZERO_TAX_THRESHOLD, float),
+    }
+    for i, year in enumerate(years):
+        for key, value in parameters_by_year.get(year, {}).items():
+            parameters[key][i] = value
+    return parameters
+
+
+def singleTaxes(incomes,
+                base_tax_percentage=BASE_TAX_PERCENTAGE,
+                margin_tax_percentage=MARGIN_TAX_PERCENTAGE,
+                margin_tax_threshold=MARGIN_TAX_THRESHOLD,
+                zero_tax_threshold=ZERO_TAX_THRESHOLD):
+    incomes = np.asarray(incomes, dtype=float)
+    base_taxes = base_tax_percentage * incomes / 100
+    margin_taxes = (
+        base_tax_percentage * margin_tax_threshold +
+        margin_tax_percentage * (incomes - margin_tax_threshold)) / 100
+    return np.where(
+        incomes > margin_tax_threshold, margin_taxes,
+        np.where(incomes <= zero_tax_threshold, 0.0, base_taxes))
+
+
+def previousYearsIncomes(incomes,
+                         n_years_losses_accumulated=N_YEARS_LOSSES_ACCUMULATED):
+    # Sum of the previous (n - 1) years for each year along the last axis
+    incomes = np.asarray(incomes, dtype=float)
+    window = n_years_losses_accumulated - 1
+    if window <= 0 or incomes.shape[-1] == 0:
+        return np.zeros_like(incomes)
+    padding = np.zeros(incomes.shape[:-1] + (window,))
+    padded = np.concatenate([padding, incomes[..., :-1]], axis=-1)
+    return sliding_window_view(padded, window, axis=-1).sum(axis=-1)
+
+
+def taxableIncomes(incomes,
+                   n_years_losses_accumulated=N_YEARS_LOSSES_ACCUMULATED):
+    # Losses of the previous years reduce the income
+    incomes = np.asarray(incomes, dtype=float)
+    previous_years_incomes = previousYearsIncomes(
+        incomes, n_years_losses_accumulated)
+    return incomes + np.minimum(previous_years_incomes, 0)
+
+
+def totalTaxes(incomes,
+               n_years_losses_accumulated=N_YEARS_LOSSES_ACCUMULATED,
+               **tax_parameters):
+    # Incomes are (..., years) arrays, e.g. (scenarios, years), and tax
+    # parameters scalars or arrays broadcastable to them
+    return singleTaxes(
+        taxableIncomes(incomes, n_years_losses_accumulated),
+        **tax_parameters)
@@ -0,0 +1,80 @@
+import os
+import sys
+
+import pandas as pd
+
+REPOSITORY_DIRECTORY = os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__)))
+sys.path.insert(0, REPOSITORY_DIRECTORY)
+
+from annual_aggregates import (
+    DIVIDEND_NAMING_CONVERSION,
+    STOCK_NAMING_CONVERSION,
+)
+from ledger import ingest, readAnnualAggregates
+
+
+snc = STOCK_NAMING_CONVERSION
+dnc = DIVIDEND_NAMING_CONVERSION
+
+
+def stockExport(rows):
+    # (sell date, security, profit) rows as readStockCsv() returns them
+    return pd.DataFrame({
+        snc["sell_date"]: pd.to_datetime([row[0] for row in rows]),
+        snc["security"]: [row[1] for row in rows],
+        snc["profit"]: [row[2] for row in rows],
+        snc["buy_cost"]: 1.0,
+        snc["sell_cost"]: 1.0,
+    })
+
+
+def dividendExport(rows, with_id=True):
+    # (id, date, security, amount) dividend rows as readDividendCsv()
+    # returns them
+    df = pd.DataFrame({
+        dnc["id"]: [row[0] for row in rows],
+        dnc["date"]: pd.to_datetime([row[1] for row in rows]),
+        dnc["transaction_type"]: dnc["dividend"],
+        dnc["security"]: [row[2] for row in rows],
+        dnc["quantity"]: 10.0,
+        dnc["price"]: "1,00",
+        dnc["fees"]: 0.0,
+        dnc["profit"]: [row[3] for row in rows],
+    })
+    return df if with_id else df.drop(columns=dnc["id"])
+
+
+def testOverlappingExportsKeepRepeatedDividends(tmp_path):
+    # The second export starts after the first of two identical dividends
+    ledger_file = str(tmp_path / "ledger.sqlite")
+    stock_df = stockExport([("2020-05-01", "A", 100.0)])
+    dividends = [
+        (1, "2020-03-01", "A", 10.0),
+        (2, "2020-03-01", "A", 10.0),
+        (3, "2020-06-01", "B", 5.0),
+    ]
+    ingest(stock_df, dividendExport(dividends[:2]), ledger_file)
+    _, new_dividend_rows, _ = ingest(
+        stock_df, dividendExport(dividends[1:]), ledger_file)
+
+    assert new_dividend_rows == 1
+    assert readAnnualAggregates(ledger_file).loc[2020, "dividend"] == 25.0
+
+
+def testRowsWithoutIdAreKeyedOnSecurity(tmp_path):
+    # Same date and amount, different securities
+    ledger_file = str(tmp_path / "ledger.sqlite")
+    stock_df = stockExport([
+        ("2020-05-01", "A", 100.0), ("2020-05-01", "B", 100.0)])
+    dividend_df = dividendExport([
+        (1, "2020-03-01", "A", 10.0), (2, "2020-03-01", "B", 10.0)],
+        with_id=False)
+    ingest(stock_df.iloc[:1], dividend_df.iloc[:1], ledger_file)
+    new_stock_rows, new_dividend_rows, _ = ingest(
+        stock_df.iloc[1:], dividend_df.iloc[1:], ledger_file)
+
+    assert (new_stock_rows, new_dividend_rows) == (1, 1)
+    annual_df = readAnnualAggregates(ledger_file)
+    assert annual_df.loc[2020, "profit"] == 200.0
+    assert annual_df.loc[2020, "dividend"] == 20.0
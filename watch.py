@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+import pandas as pd
+
+from capital_income_tax_calculator import (
+    DIVIDEND_CSV_FILE,
+    N_YEARS_LOSSES_ACCUMULATED,
+    STOCK_CSV_FILE,
+    aggregateStockData,
+    aggregateTransactionTypes,
+    annualTable,
+    combineAnnualData,
+    computeAnnualTaxes,
+    readDividendCsv,
+    readStockCsv,
+)
+from atomic_write import writeAtomically
+from calculations import growthForecast, yearlyGrowth
+from equity import FINANCE_INFO_FILE, computeEquity, readFinanceInfo
+from export_cache import CACHE_DIRECTORY, fileSignature, readCachedCsv
+from growth_fit import YEARS_PREDICTION, toJson
+from plot_wealth_chart import (
+    CSV_FILE_NAME,
+    DELIMITER,
+    readWealthData,
+)
+from snapshot_store import isSnapshotStore
+
+
+OUTPUT_DIRECTORY = "reports"
+POLL_INTERVAL = 0.5
+
+# Outputs recomputed when an input changes, in the order they are updated
+DEPENDENT_OUTPUTS = {
+    "stock_csv": ["tax"],
+    "dividend_csv": ["tax"],
+    "wealth": ["growth", "forecast", "equity"],
+    "finance_info": ["equity"],
+}
+OUTPUT_FILES = {
+    "tax": "tax.txt",
+    "growth": "growth.json",
+    "forecast": "forecast.json",
+    "equity": "equity.json",
+}
+
+
+def newWatchState(files, output_directory=OUTPUT_DIRECTORY,
+                  cache_directory=CACHE_DIRECTORY, delimiter=DELIMITER):
+    # Parsed inputs, intermediate aggregates and outputs kept between
+    # changes. Versions grow on every update of an output so readers can
+    # tell stale copies apart.
+    return {
+        "files": files,
+        "output_directory": output_directory,
+        "cache_directory": cache_directory,
+        "delimiter": delimiter,
+        "signatures": {},
+        "data": {},
+        "outputs": {},
+        "versions": {output: 0 for output in OUTPUT_FILES},
+    }
+
+
+def copyWatchState(state):
+    # Copy that a refresh can update while the state is read, updates only
+    # replace the values of these dicts
+    return {
+        **state,
+        **{key: dict(state[key])
+           for key in ["signatures", "data", "outputs", "versions"]},
+    }
+
+
+def changedInputs(state):
+    # Inputs whose size or modification time differ from the last read,
+    # missing files are left out
+    changed = []
+    for role, file_name in state["files"].items():
+        if file_name is None or not os.path.exists(file_name):
+            continue
+        if state["signatures"].get(role) != fileSignature(file_name):
+            changed.append(role)
+    return changed
+
+
+def firstChangedYear(previous_df, annual_df):
+    # First year whose aggregates differ, None when nothing changed
+    if previous_df is None or not previous_df.columns.equals(
+            annual_df.columns):
+        return annual_df.index.min()
+    years = previous_df.index.union(annual_df.index)
+    previous_df = previous_df.reindex(years)
+    current_df = annual_df.reindex(years)
+    is_changed = ~((previous_df == current_df) | (
+        previous_df.isna() & current_df.isna())).all(axis=1)
+    if not is_changed.any():
+        return None
+    return years[is_changed.to_numpy().argmax()]
+
+
+def updateAnnualTaxes(taxed_df, annual_df, first_changed_year):
+    # Taxes of a year depend on the incomes of the previous years, only the
+    # changed years and the years after them are computed again
+    if taxed_df is None or first_changed_year <= annual_df.index.min():
+        return computeAnnualTaxes(annual_df)
+    window_start = first_changed_year - (N_YEARS_LOSSES_ACCUMULATED - 1)
+    updated_df = computeAnnualTaxes(annual_df.loc[window_start:])
+    return pd.concat([
+        taxed_df.loc[:first_changed_year - 1],
+        updated_df.loc[first_changed_year:]])
+
+
+def updateTax(state, changed):
+    data = state["data"]
+    files = state["files"]
+    if "stock_csv" in changed or "stock_annual" not in data:
+        data["stock_annual"] = aggregateStockData(readCachedCsv(
+            files["stock_csv"], readStockCsv, state["cache_directory"]))
+    if "dividend_csv" in changed or "transaction_annual" not in data:
+        data["transaction_annual"] = aggregateTransactionTypes(
+            readCachedCsv(
+                files["dividend_csv"], readDividendCsv,
+                state["cache_directory"]))
+    annual_df = combineAnnualData(
+        data["stock_annual"], data["transaction_annual"])
+    first_changed_year = firstChangedYear(data.get("annual_df"), annual_df)
+    data["annual_df"] = annual_df
+    if first_changed_year is None and "tax" in state["outputs"]:
+        return False
+    state["outputs"]["tax"] = updateAnnualTaxes(
+        state["outputs"].get("tax"), annual_df,
+        annual_df.index.min() if first_changed_year is None
+        else first_changed_year)
+    return True
+
+
+def updateWealth(state):
+    # Year values come from the period cache, which only computes the
+    # periods of appended snapshots
+    date_values, year_values = readWealthData(
+        state["files"]["wealth"], state["delimiter"])
+    state["data"]["date_values"] = date_values
+    state["data"]["year_values"] = year_values
+
+
+def updateGrowth(state, changed):
+    state["outputs"]["growth"] = yearlyGrowth(state["data"]["year_values"])
+    return True
+
+
+def updateForecast(state, changed):
+    date_values = state["data"]["date_values"]
+    state["outputs"]["forecast"] = growthForecast(
+        date_values["dates_as_numbers"],
+        [date_values["savings"], date_values["equities"]],
+        ["savings", "equities"], YEARS_PREDICTION)
+    return True
+
+
+def updateEquity(state, changed):
+    # The inputs of the latest snapshot of a store with the current
+    # finance_info.yaml, omaisuus.csv does not have them
+    wealth_file = state["files"]["wealth"]
+    finance_info_file = state["files"]["finance_info"]
+    if not (wealth_file and isSnapshotStore(wealth_file) and
+            finance_info_file and os.path.exists(finance_info_file)):
+        return False
+    from snapshot_store import openSnapshotStore
+    with openSnapshotStore(wealth_file) as connection:
+        latest = connection.execute(
+            "SELECT date, portfolio_balance, cash FROM snapshots "
+            "WHERE portfolio_balance IS NOT NULL ORDER BY date DESC "
+            "LIMIT 1").fetchone()
+    connection.close()
+    if latest is None:
+        return False
+    date, portfolio_balance, cash = latest
+    savings, investment_profits = computeEquity(
+        portfolio_balance, cash, readFinanceInfo(finance_info_file))
+    state["outputs"]["equity"] = {
+        "date": date,
+        "savings": savings,
+        "investment_profits": investment_profits,
+    }
+    return True
+
+
+UPDATE_FUNCTIONS = {
+    "tax": updateTax,
+    "growth": updateGrowth,
+    "forecast": updateForecast,
+    "equity": updateEquity,
+}
+
+
+def formatOutput(output, value):
+    if output == "tax":
+        return annualTable(value)
+    return json.dumps(toJson(value))
+
+
+def writeOutput(state, output):
+    os.makedirs(state["output_directory"], exist_ok=True)
+    file_name = os.path.join(state["output_directory"], OUTPUT_FILES[output])
+    text = formatOutput(output, state["outputs"][output])
+
+    def write(path):
+        with open(path, "w") as file:
+            file.write(text)
+
+    writeAtomically(file_name, write)
+    return file_name
+
+
+def refresh(state, write=True):
+    # Reads the changed inputs and updates their dependent outputs, returns
+    # the updated outputs. An input that can not be read yet, e.g. while it
+    # is being written, is tried again on the next refresh.
+    changed = changedInputs(state)
+    signatures = {
+        role: fileSignature(state["files"][role]) for role in changed}
+    if not changed:
+        return []
+    outputs = []
+    for role in changed:
+        for output in DEPENDENT_OUTPUTS[role]:
+            if output not in outputs:
+                outputs.append(output)
+    if "wealth" in changed:
+        updateWealth(state)
+    updated = []
+    for output in outputs:
+        if output == "tax" and not all(
+                role in state["signatures"] or role in changed
+                for role in ["stock_csv", "dividend_csv"]):
+            continue
+        if UPDATE_FUNCTIONS[output](state, changed):
+            state["versions"][output] += 1
+            updated.append(output)
+            if write:
+                writeOutput(state, output)
+    state["signatures"].update(signatures)
+    return updated
+
+
+def readCommandLineArguments(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Update the reports whenever the input files change")
+    parser.add_argument("--stock-csv", default=STOCK_CSV_FILE)
+    parser.add_argument("--dividend-csv", default=DIVIDEND_CSV_FILE)
+    parser.add_argument(
+        "--wealth", default=CSV_FILE_NAME,
+        help="omaisuus.csv style file or a snapshot store")
+    parser.add_argument("--delimiter", default=DELIMITER)
+    parser.add_argument("--finance-info", default=FINANCE_INFO_FILE)
+    parser.add_argument("--output-directory", default=OUTPUT_DIRECTORY)
+    parser.add_argument("--cache-directory", default=CACHE_DIRECTORY)
+    parser.add_argument(
+        "--interval", type=float, default=POLL_INTERVAL,
+        help="Seconds between checks of the input files")
+    parser.add_argument(
+        "--once", action="store_true",
+        help="Write the reports once and exit")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = readCommandLineArguments(argv)
+    state = newWatchState({
+        "stock_csv": args.stock_csv,
+        "dividend_csv": args.dividend_csv,
+        "wealth": args.wealth,
+        "finance_info": args.finance_info,
+    }, args.output_directory, args.cache_directory, args.delimiter)
+    while True:
+        start = time.perf_counter()
+        try:
+            updated = refresh(state)
+        except Exception as error:
+            print(f"Update failed, retrying: {error}", file=sys.stderr)
+            updated = []
+        if updated:
+            print("Updated {} in {:.1f} ms".format(
+                ", ".join(OUTPUT_FILES[output] for output in updated),
+                1000 * (time.perf_counter() - start)), flush=True)
+        if args.once:
+            break
+        time.sleep(args.interval)
+
+
+if __name__ == "__main__":
+    main()